@@ -7,6 +7,11 @@ from auth import auth_bp
 from database import database_bp
 
 from config import app_config
+from firebase.cert_manager import signing_cert_manager
+from database.services_write_behind import last_login_buffer
+from database.services_deletion import resume_pending_deletions
+from database.services_firestore import otp_sweeper
+from database.services_analysis import image_analysis_queue
 
 def create_app():
     app = Flask(__name__)
@@ -24,6 +29,13 @@ def create_app():
     app.register_blueprint(auth_bp, url_prefix="/api")
     app.register_blueprint(database_bp, url_prefix="/api")
 
+    # Background services
+    signing_cert_manager.start()
+    last_login_buffer.start()
+    resume_pending_deletions()
+    otp_sweeper.start()
+    image_analysis_queue.resume_pending()
+
     return app
 
 app = create_app()
@@ -1,5 +1,3 @@
-from datetime import datetime
-
 from flask import Blueprint, g, jsonify, make_response, request, session
 from flask_restx import Api, Namespace, Resource, abort
 
@@ -16,9 +14,12 @@ from .services import (
     delete_account
 )
 
-from database.services_firestore import create_user_data, delete_user_data, get_user_data
+from database.services_firestore import create_user_data, get_user_data
+from database.services_deletion import start_account_deletion, get_deletion_status
+from database.services_write_behind import last_login_buffer
 
 from firebase.initialize import firestore_db
+from firebase.helper_functions import invalidate_user_token
 
 from utils.decorators import token_required
 from utils.formatters import format_dob
@@ -87,8 +88,8 @@ class Account(Resource):
         dob_full, dob_6digit = format_dob(dob)
         
         try:
-            create_account(email, password)
-            user = log_in(email, password)
+            # Account creation returns the new user's idToken and localId, so there is no separate log in.
+            user = create_account(email, password)
             idToken = user.get("idToken")
             create_user_data(user.get("localId"), first_name, last_name, email, dob_full, dob_6digit, account_type)
 
@@ -107,15 +108,38 @@ class Account(Resource):
     def delete(self):
         """
             (DELETE /account) Route to delete user account.
+            The auth account is deleted immediately, the user's data is deleted by a background job whose progress is available at GET /account/deletion.
         """
         try:
             firebase_token = g.firebase_token
             user_id = g.uid
 
             delete_account(firebase_token)
-            delete_user_data(user_id)
+            last_login_buffer.discard(user_id)
+            deletion_job = start_account_deletion(user_id)
+            invalidate_user_token(firebase_token)
             session.clear()
-            return make_response(jsonify({}), 204)
+            return make_response(jsonify({
+                "message": "Account deleted, user data deletion is in progress.",
+                "deletion_job": deletion_job
+            }), 202)
+        except RuntimeError as e:
+            abort(500, str(e))
+
+
+@auth_ns.route("/account/deletion")
+class AccountDeletion(Resource):
+    """
+        (GET /account/deletion) Route to check the progress of a user's data deletion job.
+    """
+    @auth_ns.doc("account_deletion_status")
+    @token_required
+    def get(self):
+        try:
+            deletion_job = get_deletion_status(g.uid)
+            return make_response(jsonify({"deletion_job": deletion_job}), 200)
+        except ValueError as e:
+            abort(404, str(e))
         except RuntimeError as e:
             abort(500, str(e))
 
@@ -138,8 +162,9 @@ class AccountLogin(Resource):
         try:
             user = log_in(email, password)
             idToken = user.get("idToken")
+            user_id = user.get("localId")
   
-            user_data = firestore_db.collection("users").document(user.get("localId"))
+            user_data = firestore_db.collection("users").document(user_id)
             user_data_snapshot = user_data.get()
             if not user_data_snapshot.exists:
                 abort(400, "User data does not exist in the database.")
@@ -151,9 +176,7 @@ class AccountLogin(Resource):
             # if dob_6digit != stored_dob_6digit:
             #     abort(400, "Verification using date of birth failed.")
 
-            user_data.update({
-                "last_login": datetime.now()
-            })
+            last_login_buffer.record(user_id)
             return make_response(jsonify({
                 "message": "User logged in successfully.",
                 "account_type": stored_account_type,
@@ -173,6 +196,7 @@ class AccountLogout(Resource):
     @auth_ns.doc("logout")
     @token_required
     def post(self):
+        invalidate_user_token(g.firebase_token)
         session.clear()
         return make_response(jsonify({"message": "User has been logged out successfully."}), 200)
 
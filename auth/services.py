@@ -4,8 +4,36 @@ import logging
     Import Helper Functions and Modules
 """
 from firebase.initialize import pyre_auth
-from firebase.helper_functions import check_email_exists
+from firebase.helper_functions import get_identity_toolkit_error_code, peek_email_exists, remember_email_exists
 from utils.validators import check_password_strength, check_valid_email
+from utils.workers import RetryingWorkerPool
+
+
+"""
+    Background dispatcher for verification emails so signup does not wait on the email send.
+"""
+verification_email_dispatcher = RetryingWorkerPool(name="verification-email", max_workers=2, max_retries=3, base_delay=2.0)
+
+
+"""
+    Identity Toolkit error codes mapped to the user-facing errors raised by the functions below.
+"""
+LOGIN_ERRORS = {
+    "EMAIL_NOT_FOUND": (ValueError, "Account does not exist, please sign up."),
+    "USER_DISABLED": (ValueError, "This account has been disabled."),
+    "TOO_MANY_ATTEMPTS_TRY_LATER": (RuntimeError, "Too many failed login attempts, please try again later."),
+}
+
+CREATE_ACCOUNT_ERRORS = {
+    "EMAIL_EXISTS": (ValueError, "Account already exists, please log in."),
+    "INVALID_EMAIL": (ValueError, "Invalid email format. Please try again."),
+    "WEAK_PASSWORD": (ValueError, "Password is not strong enough."),
+}
+
+PASSWORD_RESET_ERRORS = {
+    "EMAIL_NOT_FOUND": (ValueError, "Account does not exist, you cannot reset password."),
+    "RESET_PASSWORD_EXCEED_LIMIT": (RuntimeError, "Too many reset requests, please try again later."),
+}
 
 
 """
@@ -15,20 +43,26 @@ def log_in(email: str, password: str) -> str:
     """
         Attempts to sign in from email and pass. 
         If successful returns user dict of data, if not raises exception.
+        Account existence is derived from the sign in response itself, so this is a single upstream call.
     """
-    if not check_email_exists(email):
-        raise ValueError("Account does not exist, please sign up.")
-
     try:
-        return pyre_auth.sign_in_with_email_and_password(email, password) 
+        user = pyre_auth.sign_in_with_email_and_password(email, password)
     except Exception as e:
         logging.error(f"Error during login: {e}")
-        raise RuntimeError("Invalid credentials, please try again.")
+        error_code = get_identity_toolkit_error_code(e)
+        if error_code == "EMAIL_NOT_FOUND":
+            remember_email_exists(email, False)
+        error_class, message = LOGIN_ERRORS.get(error_code, (RuntimeError, "Invalid credentials, please try again."))
+        raise error_class(message)
+
+    remember_email_exists(email, True)
+    return user
 
-def create_account(email: str, password: str) -> None:
+def create_account(email: str, password: str) -> dict:
     """
         Attempts to create a new user from email and password. Also automatically sends verification email upon creation.
-        If successful returns user data, if user exists or other errors, exception is raised.
+        If successful returns user data (including idToken and localId, so the caller does not need to log in again), if user exists or other errors, exception is raised.
+        Existing accounts are detected from the sign up response (EMAIL_EXISTS) unless already known from the email existence cache.
     """
     if password is None or email is None:
         raise ValueError("Missing email or password, please provide and try again.")
@@ -39,7 +73,7 @@ def create_account(email: str, password: str) -> None:
     if len(password) < 8:
         raise ValueError("Password must be at least 8 characters.")
 
-    if check_email_exists(email):
+    if peek_email_exists(email):
         raise ValueError("Account already exists, please log in.")
     
     if not check_password_strength(password):
@@ -47,25 +81,32 @@ def create_account(email: str, password: str) -> None:
 
     try:
         user = pyre_auth.create_user_with_email_and_password(email, password)
-
-        id_token = user.get("idToken")
-        if not id_token:
-            raise RuntimeError("Failed to retrieve user token.")
-
-        send_verification_email(id_token)
     except Exception as e:
         logging.error(f"Error during account creation: {e}")
+        error_code = get_identity_toolkit_error_code(e)
+        if error_code == "EMAIL_EXISTS":
+            remember_email_exists(email, True)
+        error_class, message = CREATE_ACCOUNT_ERRORS.get(error_code, (RuntimeError, "Account creation failed. Please try again."))
+        raise error_class(message)
+
+    id_token = user.get("idToken")
+    if not id_token or not user.get("localId"):
+        logging.error("Error during account creation: sign up response is missing idToken or localId.")
         raise RuntimeError("Account creation failed. Please try again.")
 
+    remember_email_exists(email, True)
+    send_verification_email(id_token)
+    return user
+
 def send_verification_email(idToken: str) -> None:
     """
-        Sends email to verify user's email after account creation.
+        Queues the email to verify user's email after account creation. Sending happens in the background with retries.
     """
-    try:
-        pyre_auth.send_email_verification(idToken)
-    except Exception as e:
-        logging.error(f"Error verifying email: {e}")
-        raise RuntimeError("Unable to send verification email. Please try again.")
+    verification_email_dispatcher.submit(
+        pyre_auth.send_email_verification,
+        idToken,
+        on_failure=lambda e: logging.error(f"Error verifying email: {e}")
+    )
     
 
 def send_password_reset(email: str) -> None:
@@ -73,14 +114,13 @@ def send_password_reset(email: str) -> None:
         Send a password reset email.
         Raises an exception on failure.
     """
-    if not check_email_exists(email):
-        raise ValueError("Account does not exist, you cannot reset password.")
-
     try:
         pyre_auth.send_password_reset_email(email)
     except Exception as e:
         logging.error(f"Error during login: {e}")
-        raise RuntimeError("Unable to send reset email. Please try again.")
+        error_code = get_identity_toolkit_error_code(e)
+        error_class, message = PASSWORD_RESET_ERRORS.get(error_code, (RuntimeError, "Unable to send reset email. Please try again."))
+        raise error_class(message)
 
 def delete_account(firebase_token: str) -> None:
     """
@@ -0,0 +1,127 @@
+"""
+    Exercise analytics microbenchmark: the previous utils/normalizors implementation versus the vectorized utils.analytics.
+
+    Times per-day averages over synthetic attempts (10k and 100k by default) for both implementations, and reports separately
+    the cost of loading the attempts into columns (ExerciseColumns.from_attempts) and of the analysis itself. Also times the
+    rollup path used by GET /firestore/exercises, which reads one document per exercise per day instead of every attempt.
+
+    Run from the repository root, with numpy installed:
+        python benchmarks/exercise_analytics.py --attempts 10000 100000 --repeat 5
+
+    Sample run (365 days, 6 exercises; "after" is load + analyze; the rollup path had 2190 documents):
+         attempts     before       load    analyze      after  rollups before  rollups after
+            10000     5.5 ms    11.0 ms     2.4 ms    13.5 ms          1.4 ms         3.3 ms
+           100000   103.8 ms   116.5 ms    19.8 ms   135.7 ms          1.3 ms         3.5 ms
+"""
+import argparse
+import collections
+import datetime
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.analytics import ExerciseColumns, analyze_exercise_data
+
+
+"""
+    The implementation before user-017 (utils/normalizors.py), kept here as the baseline.
+"""
+def original_process_exercise_data(attempts):
+    grouped_data = collections.defaultdict(list)
+    for attempt in attempts:
+        grouped_data[attempt["timestamp"].date()].append(attempt)
+
+    result = {}
+    for day in sorted(grouped_data):
+        daily_attempts = grouped_data[day]
+        accuracies = [attempt["accuracy"] for attempt in daily_attempts if "accuracy" in attempt]
+        reaction_time = [attempt["avg_reaction_time"] for attempt in daily_attempts if "avg_reaction_time" in attempt]
+        result[day] = [
+            sum(accuracies) / len(accuracies) if accuracies else 0,
+            sum(reaction_time) / len(reaction_time) if reaction_time else 0
+        ]
+    return result
+
+def original_process_exercise_rollups(rollups):
+    totals = collections.defaultdict(lambda: [0, 0.0, 0.0])
+    for rollup in rollups:
+        day_totals = totals[rollup["date"].date()]
+        day_totals[0] += rollup.get("count", 0)
+        day_totals[1] += rollup.get("accuracy_sum", 0.0)
+        day_totals[2] += rollup.get("reaction_time_sum", 0.0)
+
+    result = {}
+    for day in sorted(totals):
+        count, accuracy_sum, reaction_time_sum = totals[day]
+        result[day] = [accuracy_sum / count if count else 0, reaction_time_sum / count if count else 0]
+    return result
+
+
+def synthetic_attempts(count: int, days: int = 365, exercises: int = 6, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    return [
+        {
+            "exercise_name": f"exercise-{rng.randrange(exercises)}",
+            "timestamp": start + datetime.timedelta(seconds=rng.randrange(days * 86400)),
+            "accuracy": rng.random(),
+            "avg_reaction_time": rng.uniform(200, 900)
+        }
+        for _ in range(count)
+    ]
+
+def rollups_from_attempts(attempts: list[dict]) -> list[dict]:
+    rollups = {}
+    for attempt in attempts:
+        day = attempt["timestamp"].replace(hour=0, minute=0, second=0, microsecond=0)
+        rollup = rollups.setdefault((attempt["exercise_name"], day), {
+            "exercise_name": attempt["exercise_name"], "date": day, "count": 0, "accuracy_sum": 0.0, "reaction_time_sum": 0.0
+        })
+        rollup["count"] += 1
+        rollup["accuracy_sum"] += attempt["accuracy"]
+        rollup["reaction_time_sum"] += attempt["avg_reaction_time"]
+    return list(rollups.values())
+
+def best_of(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--attempts", type=int, nargs="+", default=[10000, 100000], help="Attempt counts to time.")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement; the fastest is reported.")
+    args = parser.parse_args()
+
+    print(f"Exercise analytics, best of {args.repeat} runs")
+    print(f"  {'attempts':>9} {'before':>10} {'load':>10} {'analyze':>10} {'after':>10} {'rollups before':>15} {'rollups after':>14}")
+    for count in args.attempts:
+        attempts = synthetic_attempts(count)
+        rollups = rollups_from_attempts(attempts)
+        columns = ExerciseColumns.from_attempts(attempts)
+
+        before = best_of(lambda: original_process_exercise_data(attempts), args.repeat)
+        load = best_of(lambda: ExerciseColumns.from_attempts(attempts), args.repeat)
+        analyze = best_of(lambda: analyze_exercise_data(columns), args.repeat)
+        after = best_of(lambda: analyze_exercise_data(ExerciseColumns.from_attempts(attempts)), args.repeat)
+        rollups_before = best_of(lambda: original_process_exercise_rollups(rollups), args.repeat)
+        rollups_after = best_of(lambda: analyze_exercise_data(ExerciseColumns.from_rollups(rollups)), args.repeat)
+
+        print(
+            f"  {count:>9} {before:>7.1f} ms {load:>7.1f} ms {analyze:>7.1f} ms {after:>7.1f} ms"
+            f" {rollups_before:>12.1f} ms {rollups_after:>11.1f} ms"
+        )
+
+    print(f"  (rollups: {len(rollups)} documents for the largest run)")
+
+
+if __name__ == "__main__":
+    main()
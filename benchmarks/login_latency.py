@@ -0,0 +1,93 @@
+"""
+    Login latency benchmark (p50/p95) against a stubbed Identity Toolkit with fixed latency.
+
+    Compares the original login flow (Admin SDK get_user_by_email, then signInWithPassword) with the current auth.services.log_in,
+    which makes the sign in call only. No network calls are made: firebase.initialize is replaced with fakes before anything imports it.
+
+    Run from the repository root, with the app's dependencies installed:
+        python benchmarks/login_latency.py --latency-ms 80 --iterations 200
+"""
+import argparse
+import importlib.util
+import os
+import statistics
+import sys
+import time
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+class FakeIdentityToolkit:
+    """
+        Stands in for the Pyrebase auth client and the Admin SDK user lookup; every call sleeps for a fixed latency.
+    """
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def sign_in_with_email_and_password(self, email: str, password: str) -> dict:
+        time.sleep(self.latency)
+        return {"localId": "benchmark-user", "idToken": "benchmark-token", "email": email}
+
+    def get_user_by_email(self, email: str) -> dict:
+        time.sleep(self.latency)
+        return {"email": email}
+
+
+def load_auth_services(identity_toolkit: FakeIdentityToolkit):
+    """
+        Imports auth/services.py with firebase.initialize replaced by fakes, without importing the auth blueprint (and the whole app).
+    """
+    sys.modules["firebase.initialize"] = types.SimpleNamespace(pyre_auth=identity_toolkit)
+
+    spec = importlib.util.spec_from_file_location("benchmark_auth_services", os.path.join(ROOT, "auth", "services.py"))
+    services = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(services)
+    return services
+
+
+def original_log_in(identity_toolkit: FakeIdentityToolkit, email: str, password: str) -> dict:
+    """
+        The login flow before user-003: an existence check through the Admin SDK, then the sign in.
+    """
+    if not identity_toolkit.get_user_by_email(email):
+        raise ValueError("Account does not exist, please sign up.")
+    return identity_toolkit.sign_in_with_email_and_password(email, password)
+
+
+def measure(log_in, iterations: int) -> list[float]:
+    timings = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        log_in(f"user{i}@example.com", "benchmark-password")
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def percentile(timings: list[float], fraction: float) -> float:
+    ordered = sorted(timings)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=80.0, help="Fixed latency of each stubbed Identity Toolkit call.")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    identity_toolkit = FakeIdentityToolkit(args.latency_ms / 1000)
+    services = load_auth_services(identity_toolkit)
+
+    results = {
+        "before (lookup + sign in)": measure(lambda email, password: original_log_in(identity_toolkit, email, password), args.iterations),
+        "after (sign in only)": measure(services.log_in, args.iterations)
+    }
+
+    print(f"Login latency, {args.iterations} logins, {args.latency_ms:g} ms per upstream call")
+    for name, timings in results.items():
+        print(f"  {name:<28} p50 {statistics.median(timings):8.1f} ms   p95 {percentile(timings, 0.95):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
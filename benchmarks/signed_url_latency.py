@@ -0,0 +1,120 @@
+"""
+    Signed URL latency benchmark against a fake signer with fixed latency.
+
+    Times the original serial signing loop and the current database.services_firebase_storage.generate_signed_urls (cold and warm
+    signed URL cache) over growing media counts. No network calls are made: firebase.initialize is replaced with fakes before anything
+    imports it, and the user's media listing is replaced with synthetic files.
+
+    Run from the repository root, with the app's dependencies installed:
+        python benchmarks/signed_url_latency.py --latency-ms 50 --counts 10 50 100 200
+
+    Sample run (50 ms per signature, default SIGNING_MAX_CONCURRENCY=8):
+         files       before   after (cold)   after (warm)
+            10     502.0 ms       101.4 ms         0.0 ms
+            50    2509.9 ms       355.2 ms         0.1 ms
+           100    5022.0 ms       658.3 ms         0.3 ms
+           200   10044.0 ms      1265.2 ms         0.3 ms
+"""
+import argparse
+import os
+import sys
+import time
+import types
+from datetime import timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+class FakeBlob:
+    def __init__(self, path: str, latency: float):
+        self.path = path
+        self.latency = latency
+
+    def generate_signed_url(self, version: str, expiration: timedelta, method: str) -> str:
+        # Stands in for the IAM signBlob round trip made when the credentials have no private key.
+        time.sleep(self.latency)
+        return f"https://storage.example.com/{self.path}?X-Goog-Expires={int(expiration.total_seconds())}"
+
+
+class FakeBucket:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def blob(self, path: str, **kwargs) -> FakeBlob:
+        return FakeBlob(path, self.latency)
+
+
+def load_storage_services(bucket: FakeBucket):
+    """
+        Imports database.services_firebase_storage with firebase.initialize replaced by fakes, without importing the database blueprint.
+    """
+    sys.modules["firebase.initialize"] = types.SimpleNamespace(
+        bucket=bucket,
+        firestore_db=None,
+        gcp_firestore_db=None,
+        vision_client=None
+    )
+
+    database = types.ModuleType("database")
+    database.__path__ = [os.path.join(ROOT, "database")]
+    sys.modules["database"] = database
+
+    from database import services_firebase_storage, services_helper_functions
+    return services_firebase_storage, services_helper_functions
+
+
+def synthetic_media(count: int) -> list[dict]:
+    return [
+        {"destination_path": f"uploads/benchmark-user/{i}.jpg", "support_user_name": "Benchmark", "quick_access": None}
+        for i in range(count)
+    ]
+
+
+def original_generate_signed_urls(bucket: FakeBucket, media: list[dict], expiration=30) -> list[dict]:
+    """
+        The signing loop before user-014: one signature per file, serially, with no cache.
+    """
+    signed_urls = []
+    for file in media:
+        signed_url = bucket.blob(file['destination_path']).generate_signed_url(
+            version="v4",
+            expiration=timedelta(minutes=expiration),
+            method="GET"
+        )
+        signed_urls.append({"support_user_name": file['support_user_name'], "signed_url": signed_url})
+    return signed_urls
+
+
+def timed(function) -> float:
+    start = time.perf_counter()
+    function()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Fixed latency of each fake signature.")
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 50, 100, 200], help="Media counts to time.")
+    args = parser.parse_args()
+
+    bucket = FakeBucket(args.latency_ms / 1000)
+    storage, helpers = load_storage_services(bucket)
+
+    print(f"Signed URL generation, {args.latency_ms:g} ms per signature")
+    print(f"  {'files':>6} {'before':>12} {'after (cold)':>14} {'after (warm)':>14}")
+    for count in args.counts:
+        media = synthetic_media(count)
+        storage.get_user_media = lambda user_id, limit=None, page_token=None: (media, None)
+
+        before = timed(lambda: original_generate_signed_urls(bucket, media))
+
+        helpers.signed_url_cache.clear()
+        cold = timed(lambda: storage.generate_signed_urls("benchmark-user", limit=count))
+        warm = timed(lambda: storage.generate_signed_urls("benchmark-user", limit=count))
+
+        print(f"  {count:>6} {before:>9.1f} ms {cold:>11.1f} ms {warm:>11.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -50,6 +50,44 @@ class Config:
     FIREBASE_PROJECT_ID = os.getenv("FIREBASE_PROJECT_ID", "")
     FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
     FLASK_ENV = os.getenv("FLASK_ENV", "development")
+    # Verified ID token cache (see firebase/helper_functions.py)
+    TOKEN_CACHE_MAX_SIZE = int(os.getenv("TOKEN_CACHE_MAX_SIZE", "2048"))
+    TOKEN_CACHE_CHECK_REVOKED = os.getenv("TOKEN_CACHE_CHECK_REVOKED", "False").lower() in ["true", "1", "t"]
+    TOKEN_CACHE_REVOCATION_TTL = int(os.getenv("TOKEN_CACHE_REVOCATION_TTL", "60")) # Seconds a cached token is trusted before revocation is re-checked
+    # Short-lived email existence cache used by the signup path (see firebase/helper_functions.py)
+    EMAIL_EXISTS_CACHE_TTL = int(os.getenv("EMAIL_EXISTS_CACHE_TTL", "30"))
+    EMAIL_EXISTS_CACHE_MAX_SIZE = int(os.getenv("EMAIL_EXISTS_CACHE_MAX_SIZE", "1024"))
+    # Google public signing certs for Firebase ID tokens (see firebase/cert_manager.py)
+    FIREBASE_CERTS_URL = os.getenv("FIREBASE_CERTS_URL", "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com")
+    # Seconds between batched last_login flushes (see database/services_write_behind.py)
+    LAST_LOGIN_FLUSH_INTERVAL = float(os.getenv("LAST_LOGIN_FLUSH_INTERVAL", "30"))
+    # Process-wide cache of support user links (see database/services_firestore.py)
+    LINK_CACHE_TTL = int(os.getenv("LINK_CACHE_TTL", "600"))
+    LINK_CACHE_MAX_SIZE = int(os.getenv("LINK_CACHE_MAX_SIZE", "4096"))
+    # linked_users maps can gain entries on other instances without invalidating this one, so they are cached briefly
+    LINKED_USERS_CACHE_TTL = int(os.getenv("LINKED_USERS_CACHE_TTL", "30"))
+    # Seconds between sweeps of expired one time codes
+    OTP_SWEEP_INTERVAL = float(os.getenv("OTP_SWEEP_INTERVAL", "900"))
+    # Signed URL cache (see database/services_helper_functions.py), URLs are reused while more than this fraction of their lifetime remains
+    SIGNED_URL_CACHE_MAX_SIZE = int(os.getenv("SIGNED_URL_CACHE_MAX_SIZE", "10000"))
+    SIGNED_URL_MIN_REMAINING_FRACTION = float(os.getenv("SIGNED_URL_MIN_REMAINING_FRACTION", "0.5"))
+    # Parallel URL signing: shared pool size, per-request concurrency limit and per-request time budget in seconds
+    SIGNING_POOL_SIZE = int(os.getenv("SIGNING_POOL_SIZE", "16"))
+    SIGNING_MAX_CONCURRENCY = int(os.getenv("SIGNING_MAX_CONCURRENCY", "8"))
+    SIGNING_TIME_BUDGET = float(os.getenv("SIGNING_TIME_BUDGET", "10"))
+    # Background image analysis: concurrent jobs and retries per job
+    ANALYSIS_MAX_CONCURRENCY = int(os.getenv("ANALYSIS_MAX_CONCURRENCY", "4"))
+    ANALYSIS_MAX_RETRIES = int(os.getenv("ANALYSIS_MAX_RETRIES", "3"))
+    # Shared deadline in seconds for the concurrent Vision and Gemini calls of one image
+    ANALYSIS_TIME_BUDGET = float(os.getenv("ANALYSIS_TIME_BUDGET", "60"))
+    # Threads shared by all Vision/Gemini calls, and concurrent Gemini calls per batched analysis job
+    ANALYSIS_CALL_POOL_SIZE = int(os.getenv("ANALYSIS_CALL_POOL_SIZE", "8"))
+    ANALYSIS_GEMINI_CONCURRENCY = int(os.getenv("ANALYSIS_GEMINI_CONCURRENCY", "4"))
+    # Media uploads: concurrent uploads across requests and resumable upload chunk size in bytes (multiple of 256 KB)
+    UPLOAD_POOL_SIZE = int(os.getenv("UPLOAD_POOL_SIZE", "8"))
+    UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+    # Largest accepted media file in bytes, checked before writing since Admin SDK uploads skip Storage security rules
+    UPLOAD_MAX_SIZE = int(os.getenv("UPLOAD_MAX_SIZE", str(100 * 1024 * 1024)))
     # Default session cookie settings (can be overridden)
     SESSION_COOKIE_HTTPONLY = True
     SESSION_COOKIE_SECURE = False # Default to False, override in Prod
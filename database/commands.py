@@ -0,0 +1,45 @@
+import click
+
+from .services_firestore import backfill_message_created_at, backfill_exercise_rollups, backfill_journal_calendars
+from .services_analysis import backfill_image_analysis
+
+
+"""
+    Maintenance commands, run with `flask database <command>`.
+"""
+def register_commands(blueprint) -> None:
+    """
+        Registers the database maintenance commands on the blueprint's CLI group.
+    """
+    @blueprint.cli.command("backfill-message-timestamps")
+    def backfill_message_timestamps():
+        """
+            Set created_at on messages stored before it existed so they show up in paginated /firestore/messages results.
+        """
+        updated = backfill_message_created_at()
+        click.echo(f"Backfilled created_at on {updated} messages.")
+
+    @blueprint.cli.command("backfill-exercise-rollups")
+    def backfill_exercise_rollups_command():
+        """
+            Rebuild the daily exercise rollups read by GET /firestore/exercises from the raw attempts.
+        """
+        written = backfill_exercise_rollups()
+        click.echo(f"Wrote {written} exercise rollup documents.")
+
+    @blueprint.cli.command("backfill-journal-calendars")
+    def backfill_journal_calendars_command():
+        """
+            Rebuild the per-month journal calendar documents read by GET /firestore/journal_entries/calendar from the entries.
+        """
+        written = backfill_journal_calendars()
+        click.echo(f"Wrote {written} journal calendar documents.")
+
+    @blueprint.cli.command("backfill-image-analysis")
+    @click.option("--include-failed", is_flag=True, help="Also retry uploads whose background analysis failed.")
+    def backfill_image_analysis_command(include_failed):
+        """
+            Analyze image uploads that were never analyzed, in batched Vision requests.
+        """
+        counts = backfill_image_analysis(include_failed)
+        click.echo(f"Image analysis results: {counts}")
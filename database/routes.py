@@ -1,5 +1,3 @@
-import os
-import tempfile
 from flask import Blueprint, g, jsonify, make_response, request, session
 from flask_restx import Api, Namespace, Resource, abort
 from werkzeug.utils import secure_filename
@@ -9,35 +7,50 @@ from werkzeug.utils import secure_filename
 """
 
 from .services_firestore import (
-    get_user_data,
     generate_otp,
     retrieve_messages,
     store_messages,
     validate_otp,
     get_linked_users,
-    get_verified_uid_from_user_name,
-    verify_user_link,
-    get_random_indexed_media,
+    authorize_support_user,
+    get_random_indexed_media_batch,
     store_exercise_data,
-    get_exercise_data,
+    get_exercise_rollups,
+    store_exercise_data_bulk,
     store_journal_entries,
-    get_journal_entries
+    get_journal_entries,
+    get_journal_calendar,
+    MESSAGES_MAX_PAGE_SIZE,
+    EXERCISE_BULK_MAX_ATTEMPTS,
+    JOURNAL_MAX_PAGE_SIZE
     )
 
-from .services_firebase_storage import upload_file, generate_signed_urls
+from .services_firebase_storage import upload_files, generate_signed_urls
+from .services_helper_functions import MEDIA_MAX_PAGE_SIZE
+from .services_analysis import get_analysis_status
+from .commands import register_commands
 
 from utils.decorators import token_required
-from utils.formatters import iso_to_datetime, format_data_for_json
-from utils.normalizors import process_exercise_data
+from utils.analytics import analyze_exercise_rollups, GRANULARITIES
+from utils.formatters import (
+    iso_to_datetime,
+    format_data_for_json,
+    format_exercise_summary_for_json,
+    parse_timezone,
+    local_day_bounds,
+    parse_day_or_timestamp
+    )
+from utils.validators import parse_exercise_attempt
 
 
 """
     Declare blueprint, api, and namespace for database access backend endpoints.
 """
-database_bp = Blueprint("database_bp", __name__)
+database_bp = Blueprint("database_bp", __name__, cli_group="database")
 database_api = Api(database_bp, version="1.0", title="Database API", description="Endpoints for database access of React Frontend")
 database_ns = Namespace("database", description="Database Endpoints")
 database_api.add_namespace(database_ns)
+register_commands(database_bp)
 
 
 """
@@ -61,20 +74,16 @@ class Messages(Resource):
         if main_user_name is None:
             abort(401, {"error": "Main user name is required."})
 
-        supp_user_uid = g.uid
-        supp_user_data = get_user_data(supp_user_uid)
-
-        supp_full_name = supp_user_data.get("first_name") + " " + supp_user_data.get("last_name")
-
-        main_user_id = get_verified_uid_from_user_name(supp_user_uid, main_user_name)
-
-        linked = verify_user_link(supp_user_uid, main_user_id)
+        try:
+            authorization = authorize_support_user(g.uid, main_user_name)
+        except ValueError as e:
+            abort(401, {"error": str(e)})
 
-        if not linked:
+        if not authorization.linked:
             abort(401, {"error": "User is not linked."})
 
         try:
-            doc_id = store_messages(supp_full_name, main_user_id, messages)
+            doc_id = store_messages(authorization.support_full_name, authorization.main_user_id, messages)
             return make_response(jsonify({"message_ids": doc_id}), 201)
         except Exception as e:
             abort(500, {"error": f"Failed to store message: {e}"})
@@ -83,13 +92,25 @@ class Messages(Resource):
     @token_required
     def get(self):
         """
-            (GET /messages) Route to retrieve messages from Firestore.
+            (GET /messages?limit=&page_token=&since=) Route to retrieve messages from Firestore.
+            limit/page_token page through messages newest first, since (ISO timestamp) returns only messages newer than the client's last sync.
         """
         try:
-            messages = retrieve_messages(g.uid)
+            limit = request.args.get("limit", type=int)
+            page_token = request.args.get("page_token")
+            since = request.args.get("since")
+
+            if limit is not None and not 1 <= limit <= MESSAGES_MAX_PAGE_SIZE:
+                return make_response(jsonify({"error": f"limit must be between 1 and {MESSAGES_MAX_PAGE_SIZE}."}), 400)
+            since_timestamp = iso_to_datetime(since) if since else None
+
+            messages, next_page_token = retrieve_messages(g.uid, limit, page_token, since_timestamp)
             return make_response(jsonify({
                 "messages": messages,
+                "next_page_token": next_page_token
             }), 200)
+        except ValueError as e:
+            return make_response(jsonify({"error": str(e)}), 400)
         except Exception as e:
             abort(500, {"error": f"Failed to retrieve messages: {e}"})
 
@@ -159,44 +180,90 @@ class Media(Resource):
         descriptions = request.form.getlist("descriptions")
         file_dates = request.form.getlist("dates")
 
-        supp_user_uid = g.uid
-        supp_user_data = get_user_data(supp_user_uid)
-        supp_user_full_name = supp_user_data.get("first_name") + " " + supp_user_data.get("last_name")
-        main_user_uid = get_verified_uid_from_user_name(supp_user_uid, main_user_name)
-
-        linked = verify_user_link(supp_user_uid, main_user_uid)
+        try:
+            authorization = authorize_support_user(g.uid, main_user_name)
+        except ValueError as e:
+            return make_response(jsonify({"error": str(e)}), 401)
 
-        if not linked:
+        if not authorization.linked:
             return make_response(jsonify({"error": "User is not linked."}), 401)
 
-        for i, file_storage in enumerate(files):
-            file_name = secure_filename(file_storage.filename)
+        supp_user_uid = authorization.support_user_id
+        supp_user_full_name = authorization.support_full_name
+        main_user_uid = authorization.main_user_id
+
+        if not files:
+            return make_response(jsonify({"error": "No files provided."}), 400)
+
+        # Files are streamed from the request straight to Cloud Storage, several at a time.
+        uploads = upload_files(main_user_uid, supp_user_uid, supp_user_full_name, [
+            {
+                "stream": file_storage.stream,
+                "file_name": secure_filename(file_storage.filename),
+                "description": descriptions[i] if i < len(descriptions) else "",
+                "date": file_dates[i] if i < len(file_dates) else ""
+            }
+            for i, file_storage in enumerate(files)
+        ])
+
+        uploaded = sum(upload["status"] == "uploaded" for upload in uploads)
+        if uploaded == len(uploads):
+            return make_response(jsonify({"message": "Files uploaded successfully", "uploads": uploads}), 200)
+        if uploaded == 0:
+            return make_response(jsonify({"error": "Failed to upload files.", "uploads": uploads}), 500)
+        return make_response(jsonify({"message": f"Uploaded {uploaded} of {len(uploads)} files.", "uploads": uploads}), 207)
 
-            with tempfile.TemporaryDirectory() as tmpdir:
-                temp_path = os.path.join(tmpdir, file_name)
-                file_storage.save(temp_path)
+    @database_ns.doc("retrieve_media")
+    @token_required
+    def get(self):
+        """
+            (GET /media?limit=&page_token=) Route to retrieve media from Firebase Cloud Storage, newest first.
+            Without limit/page_token all media is returned. Otherwise a page is returned along with next_page_token.
+        """
+        try:
+            limit = request.args.get("limit", type=int)
+            page_token = request.args.get("page_token")
 
-                try:
-                    desc = descriptions[i] if i < len(descriptions) else ""
-                    date = file_dates[i] if i < len(file_dates) else ""
-                    upload_file(main_user_uid, supp_user_uid, supp_user_full_name, g.firebase_token, temp_path, file_name, desc, date)
+            if limit is not None and not 1 <= limit <= MEDIA_MAX_PAGE_SIZE:
+                return make_response(jsonify({"error": f"limit must be between 1 and {MEDIA_MAX_PAGE_SIZE}."}), 400)
 
-                except Exception as e:
-                    return {"error": str(e)}, 500
+            media, next_page_token = generate_signed_urls(g.uid, limit=limit, page_token=page_token)
+            return make_response(jsonify({"media": media, "next_page_token": next_page_token}), 200)
+        except ValueError as e:
+            return make_response(jsonify({"error": str(e)}), 400)
+        except Exception as e:
+            return make_response(jsonify({"error": f"Failed to retrieve images: {str(e)}"}), 500)        
 
-        return {"message": "Files uploaded successfully"}, 200
 
-    @database_ns.doc("retrieve_media")
+@database_ns.route("/firestore/media/<string:upload_id>/analysis")
+class MediaAnalysis(Resource):
+    @database_ns.doc("get_media_analysis_status")
     @token_required
-    def get(self):
+    def get(self, upload_id):
         """
-            (GET /media) Route to retrieve media from Firebase Cloud Storage.
+            (GET /media/<upload_id>/analysis?main_user_name=) Route to poll the background analysis status of an uploaded image.
+            Main users poll their own uploads; support users pass the linked main user's name.
         """
+        main_user_uid = g.uid
+        main_user_name = request.args.get("main_user_name")
+
+        if main_user_name:
+            try:
+                authorization = authorize_support_user(g.uid, main_user_name)
+            except ValueError as e:
+                return make_response(jsonify({"error": str(e)}), 401)
+
+            if not authorization.linked:
+                return make_response(jsonify({"error": "User is not linked."}), 401)
+            main_user_uid = authorization.main_user_id
+
         try:
-            media = generate_signed_urls(g.uid)
-            return make_response(jsonify({"media": media}), 200)
+            analysis = get_analysis_status(main_user_uid, upload_id)
+            return make_response(jsonify({"upload_id": upload_id, "analysis": analysis}), 200)
+        except ValueError as e:
+            return make_response(jsonify({"error": str(e)}), 404)
         except Exception as e:
-            return make_response(jsonify({"error": f"Failed to retrieve images: {str(e)}"}), 500)        
+            return make_response(jsonify({"error": f"Failed to retrieve analysis status: {str(e)}"}), 500)
 
 
 @database_ns.route("/firestore/media/random_indexed")
@@ -214,14 +281,10 @@ class RandomIndexedMedia(Resource):
         count = int(request.args.get("count", 1))
 
         try:
-            media_list = []
-            for _ in range(count):
-                try:
-                    media = get_random_indexed_media(g.uid, visited_indices)
-                    media_list.append(media)
-                    visited_indices.append(media["media_index"])
-                except ValueError:
-                    break
+            try:
+                media_list = get_random_indexed_media_batch(g.uid, count, visited_indices)
+            except ValueError:
+                media_list = []
 
             if not media_list:
                 return make_response(jsonify({"error": "No unvisited media found."}), 404)
@@ -260,17 +323,105 @@ class Exercises(Resource):
     @token_required
     def get(self):
         """
-            (GET /exercises) Route to retrieve exercise data from Firestore.
+            (GET /exercises?from=&to=&exercise=&granularity=) Route to retrieve exercise data from Firestore.
+            from/to (ISO timestamps, to is exclusive) and exercise are applied in the Firestore query, granularity is day (default), week or month.
         """
+        start = request.args.get("from")
+        end = request.args.get("to")
+        exercise_name = request.args.get("exercise")
+        granularity = request.args.get("granularity", "day")
+
+        if granularity not in GRANULARITIES:
+            return make_response(jsonify({"error": f"granularity must be one of: {', '.join(GRANULARITIES)}."}), 400)
+
         try:
-            all_exercise_data = get_exercise_data(g.uid)
-            normalized_data = process_exercise_data(all_exercise_data)
-            json_safe_data = format_data_for_json(normalized_data)
-            return make_response(jsonify({"exercise_data": json_safe_data}), 200)
+            start = iso_to_datetime(start) if start else None
+            end = iso_to_datetime(end) if end else None
+        except (ValueError, RuntimeError) as e:
+            return make_response(jsonify({"error": str(e)}), 400)
+
+        if start is not None and end is not None and start >= end:
+            return make_response(jsonify({"error": "from must be earlier than to."}), 400)
+
+        try:
+            exercise_rollups = get_exercise_rollups(g.uid, start, end, exercise_name)
+            analysis = analyze_exercise_rollups(exercise_rollups, granularity)
+            return make_response(jsonify({
+                "exercise_data": format_data_for_json(analysis),
+                "exercise_summary": format_exercise_summary_for_json(analysis)
+            }), 200)
         except Exception as e:
             return make_response(jsonify({"error": f"Failed to retrieve exercise data: {str(e)}"}), 500)
     
 
+@database_ns.route("/firestore/exercises/bulk")
+class ExercisesBulk(Resource):
+    @database_ns.doc("store_exercise_data_bulk")
+    @token_required
+    def post(self):
+        """
+            (POST /exercises/bulk) Route to store many exercise attempts at once, e.g. a whole session or an offline backlog.
+            Every attempt is validated up front; valid ones are stored and the response has a per-attempt status in input order.
+        """
+        data = request.json or {}
+        attempts = data.get("attempts")
+
+        if not isinstance(attempts, list) or not attempts:
+            return make_response(jsonify({"error": "attempts must be a non-empty list."}), 400)
+
+        if len(attempts) > EXERCISE_BULK_MAX_ATTEMPTS:
+            return make_response(jsonify({"error": f"At most {EXERCISE_BULK_MAX_ATTEMPTS} attempts can be stored per request."}), 400)
+
+        results = [None] * len(attempts)
+        valid_indices, valid_attempts = [], []
+        for i, attempt in enumerate(attempts):
+            try:
+                valid_attempts.append(parse_exercise_attempt(attempt))
+                valid_indices.append(i)
+            except ValueError as e:
+                results[i] = {"index": i, "status": "invalid", "error": str(e)}
+
+        try:
+            stored = store_exercise_data_bulk(valid_attempts, g.uid) if valid_attempts else []
+        except Exception as e:
+            return make_response(jsonify({"error": f"Failed to store exercise data: {str(e)}"}), 500)
+
+        for i, result in zip(valid_indices, stored):
+            results[i] = {"index": i, **result}
+
+        created = sum(result["status"] == "created" for result in results)
+        if created == len(results):
+            status_code = 201
+        elif created == 0:
+            status_code = 400 if not valid_attempts else 500
+        else:
+            status_code = 207
+
+        return make_response(jsonify({"created": created, "results": results}), status_code)
+
+
+@database_ns.route("/firestore/journal_entries/calendar")
+class JournalCalendar(Resource):
+    @database_ns.doc("get_journal_calendar")
+    @token_required
+    def get(self):
+        """
+            (GET /journal_entries/calendar?month=YYYY-MM) Route to get the days of a month that have journal entries, with per-day entry counts.
+            Months and days are UTC, matching GET /journal_entries?from=YYYY-MM-DD&to=YYYY-MM-DD without tz.
+        """
+        month = request.args.get("month")
+        if not month:
+            return make_response(jsonify({"error": "Missing required `month` query parameter."}), 400)
+
+        try:
+            days = get_journal_calendar(g.uid, month)
+            return make_response(jsonify({"month": month, "days": days}), 200)
+        except ValueError as e:
+            return make_response(jsonify({"error": str(e)}), 400)
+        except Exception as e:
+            return make_response(jsonify({"error": f"Failed to retrieve journal calendar: {str(e)}"}), 500)
+
+
 @database_ns.route("/firestore/journal_entries")
 class JournalEntries(Resource):
     @database_ns.doc("store_journal_entry")
@@ -300,29 +451,45 @@ class JournalEntries(Resource):
     def get(self):
         """
         GET /firestore/journal_entries?date=YYYY-MM-DDTHH:MM:SS.sssZ
-        Returns all journal entries for that calendar day.
+        GET /firestore/journal_entries?from=YYYY-MM-DD&to=YYYY-MM-DD&tz=America/New_York&limit=&page_token=
+        Returns journal entries for one calendar day (date) or a range (from/to, e.g. a week or month view), newest first.
+        Day boundaries are local to tz (IANA name); without tz, date uses the offset it carries and plain from/to dates use UTC.
+        A plain `to` date includes that whole day. Without limit/page_token all entries in the range are returned, otherwise they are paged.
         """
-        # 1) pull date from query-param
-        date_str = request.args.get("date")
-        if not date_str:
-            abort(400, "Missing required `date` query parameter")
-
-        # 2) parse ISO → datetime
-        try:
-            date = iso_to_datetime(date_str)
-        except Exception:
-            abort(400, "Invalid date format; expected ISO string")
-
-        # 3) fetch entries
         try:
-            entries = get_journal_entries(g.uid, date)
+            tz_name = request.args.get("tz")
+            tz = parse_timezone(tz_name)
+
+            limit = request.args.get("limit", type=int)
+            page_token = request.args.get("page_token")
+            if limit is not None and not 1 <= limit <= JOURNAL_MAX_PAGE_SIZE:
+                return make_response(jsonify({"error": f"limit must be between 1 and {JOURNAL_MAX_PAGE_SIZE}."}), 400)
+
+            # 1) work out the range, from a single day or from/to
+            date_str = request.args.get("date")
+            from_str = request.args.get("from")
+            to_str = request.args.get("to")
+            if date_str:
+                date = iso_to_datetime(date_str)
+                day_tz = tz if tz_name else date.tzinfo
+                start, end = local_day_bounds(date.astimezone(day_tz).date(), day_tz)
+            elif from_str and to_str:
+                start = parse_day_or_timestamp(from_str, tz)
+                end = parse_day_or_timestamp(to_str, tz, end_of_range=True)
+            else:
+                return make_response(jsonify({"error": "Either `date` or both `from` and `to` query parameters are required."}), 400)
+
+            # 2) fetch entries
+            entries, next_page_token = get_journal_entries(g.uid, start, end, limit, page_token)
+        except ValueError as e:
+            return make_response(jsonify({"error": str(e)}), 400)
         except Exception as e:
             abort(500, f"Failed to retrieve journal entries: {e}")
 
-        # 4) convert each timestamp to ISO for JSON
+        # 3) convert each timestamp to ISO for JSON
         for e in entries:
             if hasattr(e["timestamp"], "isoformat"):
                 e["timestamp"] = e["timestamp"].isoformat()
 
-        # 5) return under entries 
-        return make_response(jsonify({"entries": entries}), 200)
\ No newline at end of file
+        # 4) return under entries
+        return make_response(jsonify({"entries": entries, "next_page_token": next_page_token}), 200)
@@ -0,0 +1,301 @@
+import logging
+import mimetypes
+import uuid
+from concurrent.futures import Future
+from datetime import datetime, timedelta, timezone
+
+from google.cloud import firestore
+
+"""
+    Import Helper Functions
+"""
+from firebase.initialize import firestore_db, gcp_firestore_db
+from .services_helper_functions import run_image_analysis, run_image_analysis_batch, VISION_BATCH_LIMIT
+from config import app_config
+from utils.workers import RetryingWorkerPool
+
+
+"""
+    Background image analysis.
+    Uploads are stored with analysis.status = "pending" and analyzed here, off the request thread. The status moves
+    pending -> running -> completed, or to retrying/failed, and clients poll it on the upload document.
+"""
+ACTIVE_STATUSES = ["pending", "running", "retrying"]
+
+# A job still "running" this long after it started is treated as abandoned (e.g. its instance stopped) and can be claimed again.
+STALE_RUNNING_AFTER = timedelta(seconds=app_config.ANALYSIS_TIME_BUDGET * 2)
+
+
+def get_gcs_uri(destination_path: str) -> str:
+    return f"gs://{app_config.FIREBASE_CLOUD_STORAGE_BUCKET}/{destination_path}"
+
+def get_upload_path(main_user_id: str, upload_id: str) -> str:
+    return f"uploads/{main_user_id}/user_uploads/{upload_id}"
+
+def get_analysis_input(upload_data: dict) -> tuple[str, str, str]:
+    """
+        Given an upload document's data, returns the (gcs_uri, mime_type, description) the analysis runs on.
+    """
+    destination_path = upload_data["destination_path"]
+    mime_type = upload_data.get("mime_type") or mimetypes.guess_type(destination_path)[0]
+    return get_gcs_uri(destination_path), mime_type, upload_data.get("description", "")
+
+def completed_analysis(results: dict, attempts: int) -> dict:
+    return {
+        "status": "completed",
+        "analysis": results,
+        "analyzed_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "attempts": attempts
+    }
+
+def new_claim_token() -> str:
+    return uuid.uuid4().hex
+
+def is_claimable(analysis: dict, now: datetime, claim_token: str | None = None) -> bool:
+    """
+        Whether a worker may start analyzing an upload: not completed, and not running under another job's claim unless that run is stale.
+    """
+    if analysis.get("status") == "completed":
+        return False
+    if analysis.get("status") == "running" and (claim_token is None or analysis.get("claim_token") != claim_token):
+        started_at = analysis.get("started_at")
+        return started_at is None or now - started_at > STALE_RUNNING_AFTER
+    return True
+
+def claim_uploads(upload_paths: list[str], claim_token: str) -> tuple[dict, list[tuple[str, dict, int]]]:
+    """
+        Marks the claimable uploads as running under claim_token in one transaction, so two workers (or instances) never analyze the same
+        upload at once. A retry of the same job passes the same claim_token, so it can claim again an upload its failed attempt left running.
+        Returns ({upload_path: status} for uploads that were not claimed, [(upload_path, upload_data, attempts)] for those that were).
+    """
+    upload_refs = [gcp_firestore_db.document(upload_path) for upload_path in upload_paths]
+
+    @firestore.transactional
+    def claim(transaction):
+        now = datetime.now(timezone.utc)
+        statuses = {}
+        claimed = []
+        for snapshot in gcp_firestore_db.get_all(upload_refs, transaction=transaction):
+            upload_path = snapshot.reference.path
+            if not snapshot.exists:
+                statuses[upload_path] = "missing"
+                continue
+
+            upload_data = snapshot.to_dict()
+            analysis = upload_data.get("analysis") or {}
+            if not is_claimable(analysis, now, claim_token):
+                statuses[upload_path] = analysis.get("status")
+                continue
+
+            attempts = analysis.get("attempts", 0) + 1
+            transaction.update(snapshot.reference, {
+                "analysis.status": "running",
+                "analysis.attempts": attempts,
+                "analysis.started_at": now,
+                "analysis.claim_token": claim_token
+            })
+            claimed.append((upload_path, upload_data, attempts))
+        return statuses, claimed
+
+    return claim(gcp_firestore_db.transaction())
+
+def pending_analysis() -> dict:
+    """
+        The analysis field stored with a new image upload until the worker picks it up.
+    """
+    return {
+        "status": "pending",
+        "attempts": 0,
+        "queued_at": datetime.now(timezone.utc)
+    }
+
+
+class ImageAnalysisQueue:
+    """
+        Runs image analysis jobs on a bounded worker pool with retries and exponential backoff.
+        client/model are passed through to run_image_analysis, so local fakes (anything with annotate_image / generate_content)
+        can stand in for the Vision client and Gemini model.
+    """
+    def __init__(self, max_workers: int = 4, max_retries: int = 3, base_delay: float = 2.0, client=None, model=None):
+        self.client = client
+        self.model = model
+        self.pool = RetryingWorkerPool(name="image-analysis", max_workers=max_workers, max_retries=max_retries, base_delay=base_delay)
+
+    def enqueue(self, upload_path: str) -> Future:
+        """
+            Queues analysis of the upload document at upload_path. Returns the job's future.
+        """
+        return self.pool.submit(self.process, upload_path, new_claim_token(), on_failure=lambda e: self.mark_failed(upload_path, e))
+
+    def enqueue_many(self, upload_paths: list[str]) -> list[Future]:
+        """
+            Queues analysis of several uploads, VISION_BATCH_LIMIT at a time, so each group makes one batched Vision request.
+            Images that fail within a batch are re-queued on their own (with the usual retries), as is a whole batch whose job fails.
+        """
+        futures = []
+        for start in range(0, len(upload_paths), VISION_BATCH_LIMIT):
+            chunk = upload_paths[start:start + VISION_BATCH_LIMIT]
+            if len(chunk) == 1:
+                futures.append(self.enqueue(chunk[0]))
+                continue
+
+            futures.append(self.pool.submit(self._run_batch, chunk, new_claim_token(), on_failure=lambda e, chunk=chunk: [self.enqueue(path) for path in chunk]))
+        return futures
+
+    def _run_batch(self, upload_paths: list[str], claim_token: str) -> dict:
+        statuses = self.process_batch(upload_paths, failure_status="retrying", claim_token=claim_token)
+        for upload_path, status in statuses.items():
+            if status == "retrying":
+                self.enqueue(upload_path)
+        return statuses
+
+    def process(self, upload_path: str, claim_token: str | None = None) -> dict:
+        """
+            Analyzes one upload and stores the result in its analysis field. Raises on failure so the pool retries the job.
+        """
+        statuses, claimed = claim_uploads([upload_path], claim_token or new_claim_token())
+        if not claimed:
+            # Already completed, running elsewhere, or the upload (or its account) was deleted while the job was queued.
+            return {"status": statuses.get(upload_path)}
+
+        _, upload_data, attempts = claimed[0]
+        upload_ref = firestore_db.document(upload_path)
+
+        try:
+            results = run_image_analysis(*get_analysis_input(upload_data), self.client, self.model)
+            completed = completed_analysis(results, attempts)
+            upload_ref.update({"analysis": completed})
+        except Exception as e:
+            self.release_claims([upload_path], "retrying", e)
+            raise
+
+        return completed
+
+    def process_batch(self, upload_paths: list[str], failure_status: str = "failed", claim_token: str | None = None) -> dict:
+        """
+            Analyzes up to VISION_BATCH_LIMIT uploads with one batched Vision request and stores each result on its upload.
+            Images whose analysis fails get failure_status. Returns {upload_path: status}.
+            If the job itself fails after claiming, the claimed uploads are set to retrying before the error is raised.
+        """
+        statuses, claimed = claim_uploads(upload_paths, claim_token or new_claim_token())
+        if not claimed:
+            return statuses
+
+        pending = [(firestore_db.document(upload_path), upload_data, attempts) for upload_path, upload_data, attempts in claimed]
+
+        try:
+            results = run_image_analysis_batch([get_analysis_input(upload_data) for _, upload_data, _ in pending], self.client, self.model)
+
+            batch = firestore_db.batch()
+            for (upload_ref, _, attempts), result in zip(pending, results):
+                if isinstance(result, Exception):
+                    batch.update(upload_ref, {"analysis.status": failure_status, "analysis.error": str(result)})
+                    statuses[upload_ref.path] = failure_status
+                else:
+                    batch.update(upload_ref, {"analysis": completed_analysis(result, attempts)})
+                    statuses[upload_ref.path] = "completed"
+            batch.commit()
+        except Exception as e:
+            self.release_claims([upload_path for upload_path, _, _ in claimed], "retrying", e)
+            raise
+
+        return statuses
+
+    def release_claims(self, upload_paths: list[str], status: str, error: Exception) -> None:
+        """
+            Moves uploads this job claimed out of "running" after the job failed, so a retry or resume_pending can pick them up.
+            If this write fails too, the job's retry can still reclaim them with its claim_token, and resume_pending once they are stale.
+        """
+        try:
+            batch = firestore_db.batch()
+            for upload_path in upload_paths:
+                batch.update(firestore_db.document(upload_path), {"analysis.status": status, "analysis.error": str(error)})
+            batch.commit()
+        except Exception as e:
+            logging.error(f"Error releasing image analysis claims for {upload_paths}: {e}")
+
+    def mark_failed(self, upload_path: str, error: Exception) -> None:
+        try:
+            firestore_db.document(upload_path).update({"analysis.status": "failed", "analysis.error": str(error)})
+        except Exception as e:
+            logging.error(f"Error marking image analysis as failed for {upload_path}: {e}")
+
+    def resume_pending(self) -> int:
+        """
+            Re-queues analysis jobs that were interrupted (e.g. by an instance shutdown): pending and retrying jobs, and running jobs
+            that have gone stale. Jobs are claimed before processing, so one still queued on another instance is not analyzed twice.
+            Returns how many were queued.
+        """
+        try:
+            uploads = (
+                firestore_db.collection_group("user_uploads")
+                .where("analysis.status", "in", ACTIVE_STATUSES)
+                .select(["analysis.status", "analysis.started_at"])
+                .stream()
+            )
+            now = datetime.now(timezone.utc)
+            upload_paths = [upload.reference.path for upload in uploads if is_claimable(upload.to_dict().get("analysis") or {}, now)]
+            self.enqueue_many(upload_paths)
+            return len(upload_paths)
+        except Exception as e:
+            logging.error(f"Error resuming image analysis jobs: {e}")
+            return 0
+
+    def stats(self) -> dict:
+        return self.pool.stats()
+
+
+image_analysis_queue = ImageAnalysisQueue(
+    max_workers=app_config.ANALYSIS_MAX_CONCURRENCY,
+    max_retries=app_config.ANALYSIS_MAX_RETRIES
+)
+
+
+def get_analysis_status(main_user_id: str, upload_id: str) -> dict:
+    """
+        Given the main user and an upload ID, returns the upload's analysis status (and quick_access summary once completed).
+    """
+    upload = firestore_db.collection("uploads").document(main_user_id).collection("user_uploads").document(upload_id).get()
+    if not upload.exists:
+        raise ValueError("Upload not found.")
+
+    analysis = upload.to_dict().get("analysis")
+    if analysis is None:
+        return {"status": "not_applicable"}
+
+    return {
+        "status": analysis.get("status"),
+        "attempts": analysis.get("attempts", 0),
+        "error": analysis.get("error"),
+        "analyzed_at": analysis.get("analyzed_at"),
+        "quick_access": analysis.get("analysis", {}).get("quick_access")
+    }
+
+def backfill_image_analysis(include_failed: bool = False) -> dict:
+    """
+        Analyzes image uploads that were never analyzed (or whose analysis errored, and failed ones if include_failed),
+        in batches of VISION_BATCH_LIMIT, synchronously. Returns how many uploads ended in each status.
+    """
+    retry_statuses = {None, "error"} | ({"failed"} if include_failed else set())
+
+    upload_paths = []
+    for upload in firestore_db.collection_group("user_uploads").select(["file_type", "analysis.status"]).stream():
+        upload_data = upload.to_dict()
+        if upload_data.get("file_type") != "image":
+            continue
+        if (upload_data.get("analysis") or {}).get("status") in retry_statuses:
+            upload_paths.append(upload.reference.path)
+
+    counts = {}
+    for start in range(0, len(upload_paths), VISION_BATCH_LIMIT):
+        chunk = upload_paths[start:start + VISION_BATCH_LIMIT]
+        try:
+            statuses = image_analysis_queue.process_batch(chunk)
+        except Exception as e:
+            logging.error(f"Error analyzing upload batch: {e}")
+            statuses = {upload_path: "error" for upload_path in chunk}
+
+        for status in statuses.values():
+            counts[status] = counts.get(status, 0) + 1
+
+    return counts
@@ -0,0 +1,307 @@
+import logging
+import os
+import socket
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from google.cloud import firestore
+
+"""
+    Import Helper Functions
+"""
+from firebase.initialize import firestore_db, gcp_firestore_db, bucket
+from .services_firestore import delete_user_data, invalidate_user_links
+from utils.workers import RetryingWorkerPool
+
+
+"""
+    Cascade deletion engine for account deletion.
+    Each account deletion is a resumable background job tracked in deletion_jobs/{uid}. Steps run in order, are idempotent,
+    and are recorded in completed_steps as they finish so a restarted job skips work that is already done.
+    A job is claimed in a transaction (status running, owner, started_at) before it runs, so only one instance works on it at a time.
+"""
+QUERY_PAGE_SIZE = 500
+BLOB_BATCH_SIZE = 100
+BLOB_DELETE_WORKERS = 8
+
+ACTIVE_STATUSES = ["pending", "running", "retrying"]
+
+# A running job whose updated_at (refreshed as steps make progress) is older than this is treated as abandoned and can be claimed again.
+STALE_RUNNING_AFTER = timedelta(minutes=10)
+
+deletion_pool = RetryingWorkerPool(name="account-deletion", max_workers=2, max_retries=3, base_delay=5.0, max_delay=60.0)
+
+
+def delete_query_results(query, job_ref=None, step: str = "") -> int:
+    """
+        Deletes every document matched by query, a page at a time, through a BulkWriter (parallel, rate limited writes).
+        Returns how many documents were deleted.
+    """
+    deleted = 0
+    while True:
+        docs = list(query.select([]).limit(QUERY_PAGE_SIZE).stream())
+        if not docs:
+            return deleted
+
+        bulk_writer = firestore_db.bulk_writer()
+        for doc in docs:
+            bulk_writer.delete(doc.reference)
+        bulk_writer.close()
+
+        deleted += len(docs)
+        if job_ref is not None:
+            job_ref.set({"progress": {step: deleted}, "updated_at": datetime.now(timezone.utc)}, merge=True)
+
+def delete_user_messages(user_id: str, job_ref) -> int:
+    messages_ref = firestore_db.collection("users").document(user_id).collection("messages")
+    return delete_query_results(messages_ref, job_ref, "messages")
+
+def delete_user_uploads(user_id: str, job_ref) -> int:
+    uploads_ref = firestore_db.collection("uploads").document(user_id)
+    deleted = delete_query_results(uploads_ref.collection("user_uploads"), job_ref, "uploads")
+    uploads_ref.delete()
+    return deleted
+
+def delete_user_journals(user_id: str, job_ref) -> int:
+    journal_ref = firestore_db.collection("journals").document(user_id)
+    deleted = delete_query_results(journal_ref.collection("entries"), job_ref, "journals")
+    delete_query_results(journal_ref.collection("calendar"))
+    journal_ref.delete()
+    return deleted
+
+def delete_user_exercise_attempts(user_id: str, job_ref) -> int:
+    """
+        Deletes exercises/{exercise}/user_attempts/{uid}/attempts for every exercise, by path, so no collection group index is needed.
+    """
+    deleted = 0
+    for exercise_ref in firestore_db.collection("exercises").list_documents():
+        user_attempts_ref = exercise_ref.collection("user_attempts").document(user_id)
+        deleted += delete_query_results(user_attempts_ref.collection("attempts"))
+        user_attempts_ref.delete()
+
+        job_ref.set({"progress": {"exercise_attempts": deleted}, "updated_at": datetime.now(timezone.utc)}, merge=True)
+    return deleted
+
+def delete_user_exercise_rollups(user_id: str, job_ref) -> int:
+    rollups_ref = firestore_db.collection("exercise_rollups").document(user_id)
+    deleted = delete_query_results(rollups_ref.collection("days"), job_ref, "exercise_rollups")
+    rollups_ref.delete()
+    return deleted
+
+def delete_user_links(user_id: str, job_ref) -> int:
+    """
+        Deletes user_links where the user is either side, and removes the user from their support users' linked_users maps.
+    """
+    links_ref = firestore_db.collection("user_links")
+    users_ref = firestore_db.collection("users")
+
+    invalidate_user_links(user_id)
+
+    for link in links_ref.where("main_user", "==", user_id).stream():
+        invalidate_user_links(link.get("support_user"))
+        support_user_ref = users_ref.document(link.get("support_user"))
+        support_user = support_user_ref.get()
+        if support_user.exists:
+            linked_users = support_user.to_dict().get("linked_users", {})
+            stale_names = [name for name, linked_uid in linked_users.items() if linked_uid == user_id]
+            if stale_names:
+                support_user_ref.update({
+                    firestore.FieldPath("linked_users", name).to_api_repr(): firestore.DELETE_FIELD
+                    for name in stale_names
+                })
+
+    deleted = delete_query_results(links_ref.where("main_user", "==", user_id), job_ref, "links")
+    deleted += delete_query_results(links_ref.where("support_user", "==", user_id), job_ref, "links")
+    return deleted
+
+def delete_user_one_time_codes(user_id: str, job_ref) -> int:
+    codes_query = firestore_db.collection("one_time_codes").where("main_user_id", "==", user_id)
+    return delete_query_results(codes_query, job_ref, "one_time_codes")
+
+def delete_user_blobs(user_id: str, job_ref) -> int:
+    """
+        Deletes every Storage blob under {uid}/. Deletes are sent as JSON API batch requests of up to BLOB_BATCH_SIZE calls each,
+        and several batches run concurrently.
+    """
+    blobs = list(bucket.list_blobs(prefix=f"{user_id}/"))
+    chunks = [blobs[i:i + BLOB_BATCH_SIZE] for i in range(0, len(blobs), BLOB_BATCH_SIZE)]
+
+    def delete_chunk(chunk):
+        # Blobs that are already gone (e.g. on a resumed job) are not an error; anything left over is caught below.
+        with bucket.client.batch(raise_exception=False):
+            for blob in chunk:
+                blob.delete()
+        return len(chunk)
+
+    with ThreadPoolExecutor(max_workers=BLOB_DELETE_WORKERS) as executor:
+        deleted = sum(executor.map(delete_chunk, chunks))
+
+    remaining = sum(1 for _ in bucket.list_blobs(prefix=f"{user_id}/", max_results=1))
+    if remaining:
+        raise RuntimeError("Some Storage blobs could not be deleted.")
+
+    job_ref.set({"progress": {"blobs": deleted}, "updated_at": datetime.now(timezone.utc)}, merge=True)
+    return deleted
+
+def delete_user_profile(user_id: str, job_ref) -> int:
+    delete_user_data(user_id)
+    return 1
+
+
+# Links and one-time codes go first, so linked support users cannot write into subtrees that are being deleted.
+DELETION_STEPS = [
+    ("links", delete_user_links),
+    ("one_time_codes", delete_user_one_time_codes),
+    ("messages", delete_user_messages),
+    ("uploads", delete_user_uploads),
+    ("journals", delete_user_journals),
+    ("exercise_attempts", delete_user_exercise_attempts),
+    ("exercise_rollups", delete_user_exercise_rollups),
+    ("blobs", delete_user_blobs),
+    ("profile", delete_user_profile),
+]
+
+
+def new_job_owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+def is_claimable(job_data: dict, owner: str | None, now: datetime) -> bool:
+    """
+        Whether owner may run a deletion job: not completed, and not running under another owner unless that run is stale.
+    """
+    if job_data.get("status") == "completed":
+        return False
+    if job_data.get("status") == "running" and job_data.get("owner") != owner:
+        updated_at = job_data.get("updated_at")
+        return updated_at is None or now - updated_at > STALE_RUNNING_AFTER
+    return True
+
+def claim_deletion_job(user_id: str, owner: str) -> list[str] | None:
+    """
+        Marks the user's deletion job as running under owner in one transaction. Returns its completed steps, or None if it was not claimed.
+        A retry of the same job (same owner) can always claim it again, even if its previous attempt could not record the failure.
+    """
+    job_ref = gcp_firestore_db.collection("deletion_jobs").document(user_id)
+
+    @firestore.transactional
+    def claim(transaction):
+        now = datetime.now(timezone.utc)
+        job = job_ref.get(transaction=transaction)
+        job_data = job.to_dict() if job.exists else {}
+        if not is_claimable(job_data, owner, now):
+            return None
+
+        transaction.set(job_ref, {"status": "running", "owner": owner, "started_at": now, "updated_at": now}, merge=True)
+        return job_data.get("completed_steps", [])
+
+    return claim(gcp_firestore_db.transaction())
+
+def submit_deletion_job(user_id: str) -> None:
+    owner = new_job_owner()
+    deletion_pool.submit(run_deletion_job, user_id, owner, on_failure=lambda e: mark_deletion_failed(user_id, e))
+
+def run_deletion_job(user_id: str, owner: str) -> None:
+    """
+        Claims and runs (or resumes) the cascade deletion for the user, skipping steps already recorded as completed.
+        Does nothing if the job is completed or running on another instance.
+    """
+    completed_steps = claim_deletion_job(user_id, owner)
+    if completed_steps is None:
+        return
+
+    job_ref = firestore_db.collection("deletion_jobs").document(user_id)
+
+    try:
+        for step, delete_step in DELETION_STEPS:
+            if step in completed_steps:
+                continue
+
+            count = delete_step(user_id, job_ref)
+            job_ref.set({
+                "completed_steps": firestore.ArrayUnion([step]),
+                "progress": {step: count},
+                "updated_at": datetime.now(timezone.utc)
+            }, merge=True)
+    except Exception as e:
+        job_ref.set({"status": "retrying", "error": str(e), "updated_at": datetime.now(timezone.utc)}, merge=True)
+        raise
+
+    job_ref.set({
+        "status": "completed",
+        "error": firestore.DELETE_FIELD,
+        "completed_at": datetime.now(timezone.utc)
+    }, merge=True)
+
+def mark_deletion_failed(user_id: str, error: Exception) -> None:
+    firestore_db.collection("deletion_jobs").document(user_id).set({
+        "status": "failed",
+        "error": str(error),
+        "updated_at": datetime.now(timezone.utc)
+    }, merge=True)
+
+def start_account_deletion(user_id: str) -> dict:
+    """
+        Records a deletion job for the user and queues it in the background. Returns the initial job status.
+    """
+    job_ref = gcp_firestore_db.collection("deletion_jobs").document(user_id)
+
+    @firestore.transactional
+    def register(transaction):
+        job = job_ref.get(transaction=transaction)
+        job_data = job.to_dict() if job.exists else {}
+        update = {
+            "user_id": user_id,
+            "total_steps": len(DELETION_STEPS),
+            "requested_at": datetime.now(timezone.utc),
+            "updated_at": datetime.now(timezone.utc)
+        }
+        # A job that is running (or done) keeps its status, so a repeated request cannot make it claimable while it runs.
+        if job_data.get("status") not in ("running", "completed"):
+            update["status"] = "pending"
+        transaction.set(job_ref, update, merge=True)
+
+    try:
+        register(gcp_firestore_db.transaction())
+    except Exception as e:
+        raise RuntimeError(f"Error starting account deletion: {e}")
+
+    submit_deletion_job(user_id)
+    return get_deletion_status(user_id)
+
+def resume_pending_deletions() -> int:
+    """
+        Re-queues deletion jobs that were interrupted (e.g. by an instance shutdown): pending and retrying jobs, and running jobs that
+        have gone stale. Jobs are claimed before they run, so a job resumed by several instances still runs on only one. Returns how many were queued.
+    """
+    try:
+        jobs = firestore_db.collection("deletion_jobs").where("status", "in", ACTIVE_STATUSES).stream()
+        now = datetime.now(timezone.utc)
+        resumed = 0
+        for job in jobs:
+            if not is_claimable(job.to_dict(), None, now):
+                continue
+            submit_deletion_job(job.id)
+            resumed += 1
+        return resumed
+    except Exception as e:
+        logging.error(f"Error resuming account deletions: {e}")
+        return 0
+
+def get_deletion_status(user_id: str) -> dict:
+    """
+        Given a user ID, returns the deletion job's status, completed steps and per-step progress counts.
+    """
+    job = firestore_db.collection("deletion_jobs").document(user_id).get()
+    if not job.exists:
+        raise ValueError("No deletion job found for user.")
+
+    job_data = job.to_dict()
+    completed_steps = job_data.get("completed_steps", [])
+    return {
+        "status": job_data.get("status"),
+        "completed_steps": completed_steps,
+        "total_steps": job_data.get("total_steps", len(DELETION_STEPS)),
+        "progress": job_data.get("progress", {}),
+        "error": job_data.get("error")
+    }
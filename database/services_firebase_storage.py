@@ -1,9 +1,14 @@
+import logging
 import mimetypes
 import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from typing import IO
 
-from firebase.initialize import pyre_cloud_storage, bucket
-from .services_helper_functions import store_upload_metadata, get_user_media, analyze_image
+from firebase.initialize import bucket
+from .services_helper_functions import reserve_media_indices, store_upload_metadata, get_user_media, sign_urls
+from .services_analysis import image_analysis_queue, pending_analysis, get_upload_path
 from config import app_config
 
 
@@ -23,29 +28,79 @@ def get_file_type(file_path: str) -> str:
     if mime_type in image_types:
         return "image", mime_type
     elif mime_type in video_types:
-        return "video". mime_type
+        return "video", mime_type
     elif mime_type in text_types:
         return "text", mime_type
     else:
         return "other", mime_type
 
 
-def upload_file(main_user_id: str, support_user_id: str, support_user_name: str, support_user_firebase_token: str, file_path: str, original_file_name: str, description: str, date: str) -> None:
+# Resumable upload chunk size, rounded down to the 256 KB multiple Cloud Storage requires.
+UPLOAD_CHUNK_SIZE = max(app_config.UPLOAD_CHUNK_SIZE // (256 * 1024), 1) * 256 * 1024
+
+upload_executor = ThreadPoolExecutor(max_workers=app_config.UPLOAD_POOL_SIZE, thread_name_prefix="media-upload")
+
+def get_stream_size(file_stream: IO[bytes]) -> int | None:
+    """
+        Returns how many bytes remain in the stream from its current position, or None if the stream is not seekable.
+    """
+    try:
+        position = file_stream.tell()
+        size = file_stream.seek(0, os.SEEK_END) - position
+        file_stream.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+def validate_upload(main_user_id: str, file_type: str, stream_size: int | None) -> None:
     """
-        Given a user ID and file path, uploads the file to Firebase Cloud Storage.
+        Server-side checks for uploads, which go through the Admin SDK and so are not evaluated against Storage security rules:
+        the destination must be a single user's folder, the file type must be an accepted media type, and the size must be within UPLOAD_MAX_SIZE.
+        The caller must already have authorized the support user for main_user_id (authorize_support_user). Raises ValueError otherwise.
+    """
+    if not main_user_id or "/" in main_user_id:
+        raise ValueError("Invalid upload destination.")
+    if file_type == "other":
+        raise ValueError("Unsupported file type.")
+    if stream_size is None:
+        raise ValueError("Could not determine the file size.")
+    if stream_size == 0:
+        raise ValueError("File is empty.")
+    if stream_size > app_config.UPLOAD_MAX_SIZE:
+        raise ValueError(f"File is larger than {app_config.UPLOAD_MAX_SIZE // (1024 * 1024)} MB.")
+
+def upload_file(main_user_id: str, support_user_id: str, support_user_name: str, file_stream: IO[bytes], original_file_name: str, description: str, date: str, enqueue_analysis: bool = True, media_index: int | None = None) -> dict:
+    """
+        Given a user ID and a file stream, uploads the file to Firebase Cloud Storage and stores its metadata.
+        The upload is checked by validate_upload first. Files up to UPLOAD_CHUNK_SIZE go in a single request, larger ones are sent
+        as a resumable upload in UPLOAD_CHUNK_SIZE chunks.
+        Images are stored with analysis.status = "pending" and analyzed in the background by image_analysis_queue.
+        Callers uploading several files pass enqueue_analysis=False and queue them together with image_analysis_queue.enqueue_many,
+        and pass a media_index from one reserve_media_indices call. If the metadata cannot be stored the uploaded blob is deleted.
+        Returns the upload's ID, destination path and analysis status.
     """
 
     try:
-        file_type, mime_type = get_file_type(file_path)
-        file_ext = os.path.splitext(file_path)[1]
+        file_type, mime_type = get_file_type(original_file_name)
+        stream_size = get_stream_size(file_stream)
+        validate_upload(main_user_id, file_type, stream_size)
 
+        file_ext = os.path.splitext(original_file_name)[1]
+        approx_date_taken = datetime.strptime(date, "%Y-%m-%d").strftime("%Y-%m-%d")
+
+        # Files uploaded in the same second would otherwise share a name.
         timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        file_name = f"{timestamp}{file_ext}"
+        file_name = f"{timestamp}_{uuid.uuid4().hex[:8]}{file_ext}"
         destination_path = f"{main_user_id}/{file_name}"
 
-        pyre_cloud_storage.child(destination_path).put(file_path, support_user_firebase_token)
+        if stream_size <= UPLOAD_CHUNK_SIZE:
+            blob = bucket.blob(destination_path)
+        else:
+            blob = bucket.blob(destination_path, chunk_size=UPLOAD_CHUNK_SIZE)
+        if media_index is None:
+            media_index = reserve_media_indices(main_user_id, 1)
 
-        gcs_uri = f"gs://{app_config.FIREBASE_CLOUD_STORAGE_BUCKET}/{destination_path}"
+        blob.upload_from_file(file_stream, content_type=mime_type)
 
         metadata = {
             "support_user_name": support_user_name,
@@ -55,38 +110,85 @@ def upload_file(main_user_id: str, support_user_id: str, support_user_name: str,
             "description": description,
             "destination_path": destination_path,
             "file_type": file_type,
+            "mime_type": mime_type,
             "uploaded_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "approx_date_taken": datetime.strptime(date, "%Y-%m-%d").strftime("%Y-%m-%d")
+            "approx_date_taken": approx_date_taken,
+            "media_index": media_index
         }
 
         if file_type == "image":
-            analysis = analyze_image(gcs_uri, mime_type, description)
-            metadata["analysis"] = analysis
-
-        store_upload_metadata(metadata)
+            metadata["analysis"] = pending_analysis()
+
+        try:
+            upload_path = store_upload_metadata(metadata)
+        except Exception:
+            # Without its metadata the blob would never be listed or deleted with the account, so remove it.
+            try:
+                blob.delete()
+            except Exception as e:
+                logging.error(f"Error deleting orphaned upload {destination_path}: {e}")
+            raise
+
+        if file_type == "image" and enqueue_analysis:
+            image_analysis_queue.enqueue(upload_path)
+
+        return {
+            "upload_id": upload_path.rsplit("/", 1)[-1],
+            "destination_path": destination_path,
+            "analysis_status": metadata["analysis"]["status"] if file_type == "image" else None
+        }
 
     except Exception as e:
         raise RuntimeError(f"Error uploading file: {e}")
 
-def generate_signed_urls(user_id: str, expiration=30) -> dict:
+def upload_files(main_user_id: str, support_user_id: str, support_user_name: str, files: list[dict]) -> list[dict]:
+    """
+        Given files as {"stream", "file_name", "description", "date"} dicts, uploads them concurrently on upload_executor and
+        queues their images for batched analysis. Media indices for all files are reserved up front in one transaction, so the
+        concurrent uploads do not contend on the media counter.
+        Returns a status per file, in order: "uploaded" (with the upload's ID) or "failed" (with the error).
+    """
+    try:
+        first_index = reserve_media_indices(main_user_id, len(files))
+    except Exception as e:
+        return [{"file_name": file["file_name"], "status": "failed", "error": str(e)} for file in files]
+
+    futures = [
+        upload_executor.submit(upload_file, main_user_id, support_user_id, support_user_name, file["stream"], file["file_name"], file["description"], file["date"], False, first_index + position)
+        for position, file in enumerate(files)
+    ]
+
+    results = []
+    image_upload_paths = []
+    for file, future in zip(files, futures):
+        try:
+            upload = future.result()
+            results.append({"file_name": file["file_name"], "status": "uploaded", **upload})
+            if upload["analysis_status"]:
+                image_upload_paths.append(get_upload_path(main_user_id, upload["upload_id"]))
+        except Exception as e:
+            results.append({"file_name": file["file_name"], "status": "failed", "error": str(e)})
+
+    # Images are analyzed in groups so each group makes one batched Vision request.
+    image_analysis_queue.enqueue_many(image_upload_paths)
+
+    return results
+
+def generate_signed_urls(user_id: str, expiration=30, limit: int | None = None, page_token: str | None = None) -> tuple[list[dict], str | None]:
     """
-        Given a user ID, generates signed URLs for all images in the user's uploads. Signed URLs expire after 30 minutes.
+        Given a user ID, generates signed URLs for the images in the user's uploads (all of them, or a page when limit/page_token
+        are given). Signed URLs expire after 30 minutes. Returns the signed URLs and the token for the next page.
     """
     try:
-        media = get_user_media(user_id)
+        media, next_page_token = get_user_media(user_id, limit, page_token)
 
-        signed_urls = []
-        for file in media:
-            blob = bucket.blob(file['destination_path'])
-            signed_url = blob.generate_signed_url(
-                version="v4",
-                expiration=timedelta(minutes=expiration),
-                method="GET"
-            )
+        urls = sign_urls([file['destination_path'] for file in media], timedelta(minutes=expiration))
 
+        signed_urls = []
+        for file, url in zip(media, urls):
             signed_url = {
                 "support_user_name": file['support_user_name'],
-                "signed_url": signed_url
+                "signed_url": url
             }
 
             quick_access = file.get('quick_access')
@@ -95,7 +197,9 @@ def generate_signed_urls(user_id: str, expiration=30) -> dict:
 
             signed_urls.append(signed_url)
 
-        return signed_urls
+        return signed_urls, next_page_token
 
+    except ValueError:
+        raise
     except Exception as e:
         raise RuntimeError(f"Error generating signed URLs: {e}")
\ No newline at end of file
@@ -1,13 +1,134 @@
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
+import hashlib
+import hmac
 import random
 
+from flask import g, has_app_context
+from google.cloud import firestore
+
 """
     Import Helper Functions
 """
-from firebase.initialize import firestore_db
-from .services_helper_functions import generate_per_file_signed_url
+from firebase.initialize import firestore_db, gcp_firestore_db
+from .services_helper_functions import sign_urls
+
+from config import app_config
+from utils.cache import TTLCache
+from utils.workers import PeriodicTask
+from utils.formatters import iso_to_datetime, encode_page_token, decode_page_token
+
+"""
+    Request-scoped read cache, stored on flask.g so each document is fetched at most once per request.
+    Outside of an app context (e.g. background jobs) reads go straight to Firestore.
+"""
+def get_document(doc_ref):
+    """
+        Given a document reference, returns its snapshot, reusing one already fetched during this request.
+    """
+    if not has_app_context():
+        return doc_ref.get()
+
+    cache = g.setdefault("firestore_read_cache", {})
+    stats = g.setdefault("firestore_read_stats", {"hits": 0, "misses": 0})
+
+    snapshot = cache.get(doc_ref.path)
+    if snapshot is not None:
+        stats["hits"] += 1
+        return snapshot
+
+    stats["misses"] += 1
+    snapshot = doc_ref.get()
+    cache[doc_ref.path] = snapshot
+    return snapshot
+
+def get_documents(doc_refs: list) -> list:
+    """
+        Given document references, returns their snapshots in the same order, fetching every uncached one in a single get_all batch.
+    """
+    if not has_app_context():
+        snapshots = {snapshot.reference.path: snapshot for snapshot in firestore_db.get_all(doc_refs)}
+        return [snapshots[doc_ref.path] for doc_ref in doc_refs]
+
+    cache = g.setdefault("firestore_read_cache", {})
+    stats = g.setdefault("firestore_read_stats", {"hits": 0, "misses": 0})
+
+    missing_refs = [doc_ref for doc_ref in doc_refs if doc_ref.path not in cache]
+    stats["hits"] += len(doc_refs) - len(missing_refs)
+    if missing_refs:
+        stats["misses"] += len(missing_refs)
+        for snapshot in firestore_db.get_all(missing_refs):
+            cache[snapshot.reference.path] = snapshot
+
+    return [cache[doc_ref.path] for doc_ref in doc_refs]
+
+def remember_document(snapshot) -> None:
+    """
+        Stores a snapshot fetched outside get_document (e.g. on a worker thread) in the request-scoped read cache.
+    """
+    if has_app_context():
+        g.setdefault("firestore_read_cache", {})[snapshot.reference.path] = snapshot
+        stats = g.setdefault("firestore_read_stats", {"hits": 0, "misses": 0})
+        stats["misses"] += 1
+
+def forget_document(doc_ref) -> None:
+    """
+        Drops a document from the request-scoped read cache after it has been written or deleted.
+    """
+    if has_app_context():
+        g.setdefault("firestore_read_cache", {}).pop(doc_ref.path, None)
+
+def get_request_read_stats() -> dict:
+    """
+        Returns hit/miss counters for the request-scoped read cache (misses are actual Firestore reads).
+    """
+    if not has_app_context():
+        return {"hits": 0, "misses": 0}
+    return dict(g.get("firestore_read_stats", {"hits": 0, "misses": 0}))
+
+
+"""
+    Process-wide LRU+TTL caches for support user links, which only change in validate_otp and on account deletion.
+    Only confirmed links are cached in link_state_cache, so a new link is never hidden by a stale negative entry.
+    Only non-empty linked_users maps are cached, for LINKED_USERS_CACHE_TTL, and a name missing from a cached map is read through to Firestore,
+    since links created on another instance do not invalidate this one.
+"""
+link_state_cache = TTLCache(max_size=app_config.LINK_CACHE_MAX_SIZE, default_ttl=app_config.LINK_CACHE_TTL)
+linked_users_cache = TTLCache(max_size=app_config.LINK_CACHE_MAX_SIZE, default_ttl=app_config.LINKED_USERS_CACHE_TTL)
+
+def remember_linked_users(user_id: str, linked_users: dict) -> None:
+    if linked_users:
+        linked_users_cache.set(user_id, dict(linked_users))
+
+def invalidate_user_links(user_id: str) -> None:
+    """
+        Drops every cached link and linked_users map involving the user, on either side of the link.
+    """
+    linked_users_cache.invalidate(user_id)
+    link_state_cache.invalidate_where(lambda key: user_id in key)
+
+
+"""
+    Query limits.
+"""
+FIRESTORE_BATCH_LIMIT = 500
+FIRESTORE_IN_QUERY_LIMIT = 30
+EXERCISE_BULK_MAX_ATTEMPTS = 2000
+MESSAGES_PAGE_SIZE = 50
+MESSAGES_MAX_PAGE_SIZE = 100
+JOURNAL_PAGE_SIZE = 50
+JOURNAL_MAX_PAGE_SIZE = 100
+JOURNAL_MAX_RANGE_DAYS = 366
+OTP_LIFETIME_MINUTES = 5
+OTP_GENERATION_ATTEMPTS = 5
+
+
+"""
+    Executor for independent reads that are issued in parallel within a request.
+"""
+read_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="firestore-read")
 
-from utils.formatters import iso_to_datetime
 
 """
     Firestore Helper Function(s)
@@ -17,7 +138,9 @@ def delete_user_data(user_token: str) -> None:
         Given a firebase token, deletes the user's data from Firestore.
     """
     try:
-        firestore_db.collection("users").document(user_token).delete()
+        user_ref = firestore_db.collection("users").document(user_token)
+        user_ref.delete()
+        forget_document(user_ref)
     except Exception as e:
         raise RuntimeError(f"Error deleting user data: {e}")
 
@@ -26,7 +149,9 @@ def create_user_data(user_id: str, first_name: str, last_name: str, email: str,
         Given user data, creates a new user document in Firestore.
     """
     try:
-        firestore_db.collection("users").document(user_id).set({
+        user_ref = firestore_db.collection("users").document(user_id)
+        forget_document(user_ref)
+        user_ref.set({
             "first_name": first_name,
             "last_name": last_name,
             "email": email,
@@ -43,7 +168,7 @@ def get_user_data(user_id: str) -> dict:
     """
         Given a user ID, retrieves the user's data from Firestore.
     """
-    user_data = firestore_db.collection("users").document(user_id).get()
+    user_data = get_document(firestore_db.collection("users").document(user_id))
     if not user_data.exists:
         raise ValueError("User data does not exist in the database.")
     
@@ -53,6 +178,7 @@ def get_user_data(user_id: str) -> dict:
 def store_messages(support_full_name: str, main_user_id: str, messages: list[str]) -> list[str]:
     """
         Given user id and array of messages, batch store the messages in Firestore using batch writes.
+        created_at is a server timestamp used for ordering and incremental sync, timestamp is the legacy day string.
     """
     user_ref = firestore_db.collection("users").document(main_user_id).collection("messages")
 
@@ -65,7 +191,8 @@ def store_messages(support_full_name: str, main_user_id: str, messages: list[str
         batch.set(doc_ref, {
             "support_full_name": support_full_name,
             "message": msg,
-            "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%d")
+            "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%d"),
+            "created_at": firestore.SERVER_TIMESTAMP
             })
         doc_id.append(doc_ref.id)
     
@@ -73,178 +200,421 @@ def store_messages(support_full_name: str, main_user_id: str, messages: list[str
 
     return doc_id
 
-def retrieve_messages(user_id: str) -> tuple:
+def retrieve_messages(user_id: str, limit: int | None = None, page_token: str | None = None, since: datetime | None = None) -> tuple[list[dict], str | None]:
     """
-        Retrieves support user uploaded messages from Firestore.
+        Retrieves support user uploaded messages from Firestore, newest first.
+        Without limit/page_token/since every message is returned (legacy behaviour). Otherwise messages are paged by (created_at, document id),
+        and since restricts the result to messages created after the client's last sync.
+        Returns the messages and the token for the next page (None when there are no more).
     """
     user_ref = firestore_db.collection("users").document(user_id).collection("messages")
-    
-    query = user_ref.order_by("timestamp", direction="DESCENDING")
 
-    messages = query.stream()
+    if limit is None and page_token is None and since is None:
+        query = user_ref.order_by("timestamp", direction="DESCENDING")
+        return [format_message(message) for message in query.stream()], None
+
+    limit = limit or MESSAGES_PAGE_SIZE
+
+    query = user_ref
+    if since is not None:
+        query = query.where("created_at", ">", since)
+    query = (
+        query.order_by("created_at", direction="DESCENDING")
+        .order_by(firestore.FieldPath.document_id(), direction="DESCENDING")
+    )
+
+    if page_token is not None:
+        cursor = decode_page_token(page_token)
+        try:
+            query = query.start_after({
+                "created_at": datetime.fromisoformat(cursor["created_at"]),
+                "__name__": cursor["id"]
+            })
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Invalid page token.")
+
+    # Fetch one extra document to know whether another page exists.
+    messages = list(query.limit(limit + 1).stream())
+
+    next_page_token = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        last_message = messages[-1]
+        next_page_token = encode_page_token({
+            "created_at": last_message.get("created_at").isoformat(),
+            "id": last_message.id
+        })
+
+    return [format_message(message) for message in messages], next_page_token
 
-    message_list = []
+def format_message(message) -> dict:
+    """
+        Given a message snapshot, returns the fields sent to the frontend.
+    """
+    message_dict = message.to_dict()
+    created_at = message_dict.get("created_at")
+    return {
+        "id": message.id,
+        "support_full_name": message_dict["support_full_name"],
+        "message": message_dict["message"],
+        "timestamp": message_dict["timestamp"],
+        "created_at": created_at.isoformat() if created_at is not None else None
+    }
 
-    for message in messages:
+def backfill_message_created_at() -> int:
+    """
+        Sets created_at on messages stored before it existed (from their day string), so they appear in paginated results.
+        Returns how many messages were updated.
+    """
+    updated = 0
+    batch = firestore_db.batch()
+    pending_writes = 0
+
+    for message in firestore_db.collection_group("messages").stream():
         message_dict = message.to_dict()
-        message_list.append({
-            "support_full_name": message_dict["support_full_name"],
-            "message": message_dict["message"],
-            "timestamp": message_dict["timestamp"]
-        })
+        if message_dict.get("created_at") is not None or not message_dict.get("timestamp"):
+            continue
+
+        created_at = datetime.strptime(message_dict["timestamp"], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        batch.update(message.reference, {"created_at": created_at})
+        pending_writes += 1
+        updated += 1
 
-    return message_list
+        if pending_writes == FIRESTORE_BATCH_LIMIT:
+            batch.commit()
+            batch = firestore_db.batch()
+            pending_writes = 0
+
+    if pending_writes:
+        batch.commit()
+
+    return updated
+
+def otp_document_id(otp: str) -> str:
+    """
+        Given an OTP, returns the one_time_codes document ID it is stored under (an HMAC of the code, so codes are not stored in plain text).
+    """
+    return hmac.new(app_config.SECRET_KEY.encode("utf-8"), str(otp).encode("utf-8"), hashlib.sha256).hexdigest()
+
+def otp_has_expired(otp_data: dict) -> bool:
+    expires_at = otp_data["expires_at"]
+    if hasattr(expires_at, 'to_datetime'):
+        expires_at = expires_at.to_datetime()
+    return datetime.now(tz=timezone.utc) > expires_at
 
 def generate_otp(user_id: str) -> str:
     """
-        Generates a 6-digit OTP for the user and stores it in Firestore.
+        Generates a 6-digit OTP for the user and stores it in Firestore, keyed by the code so validation is a single lookup.
+        A code that collides with another user's unexpired code is regenerated, and the user's previous codes are removed.
     """
-    otp = str(random.randint(100000, 999999))
+    codes_ref = gcp_firestore_db.collection("one_time_codes")
+
+    @firestore.transactional
+    def store_code(transaction, otp_ref) -> bool:
+        snapshot = otp_ref.get(transaction=transaction)
+        if snapshot.exists and not otp_has_expired(snapshot.to_dict()):
+            return False
+
+        previous_codes = list(transaction.get(codes_ref.where("main_user_id", "==", user_id)))
+        for previous_code in previous_codes:
+            if previous_code.id != otp_ref.id:
+                transaction.delete(previous_code.reference)
+
+        transaction.set(otp_ref, {
+            "main_user_id": user_id,
+            "expires_at": datetime.now(tz=timezone.utc) + timedelta(minutes=OTP_LIFETIME_MINUTES)
+        })
+        return True
 
-    expiration_date = datetime.now(tz=timezone.utc) + timedelta(minutes=5)
+    for _ in range(OTP_GENERATION_ATTEMPTS):
+        otp = str(random.randint(100000, 999999))
+        otp_ref = codes_ref.document(otp_document_id(otp))
+        if store_code(gcp_firestore_db.transaction(), otp_ref):
+            return otp
 
-    otp_ref = firestore_db.collection("one_time_codes").document(user_id)
-    otp_ref.set({
-        "otp": otp, 
-        "main_user_id": user_id, 
-        "expires_at": expiration_date
-    })
-    return otp
+    raise RuntimeError("Could not generate a unique OTP, please try again.")
 
 def validate_otp(support_user_id: str, entered_otp: str) -> tuple[bool, str]:
     """
         Validates an OTP and links the support user if the OTP is correct and not expired.
+        The OTP lookup, link check, main user read, link write, linked_users merge and OTP deletion run in one transaction.
     """
-    otp_ref = firestore_db.collection("one_time_codes").where("otp", "==", str(entered_otp)).stream()
-
-    docs = list(otp_ref)
-    if not docs:
+    if entered_otp is None:
         return False, "OTP is invalid."
 
-    for doc in docs:
-        data = doc.to_dict()
-        expires_at = data["expires_at"]
-        if hasattr(expires_at, 'to_datetime'):
-            expires_at = expires_at.to_datetime()
+    otp_ref = gcp_firestore_db.collection("one_time_codes").document(otp_document_id(entered_otp))
 
-        main_user_id = data["main_user_id"]
+    @firestore.transactional
+    def redeem_code(transaction) -> tuple[bool, str, str | None]:
+        otp_snapshot = otp_ref.get(transaction=transaction)
+        if not otp_snapshot.exists:
+            return False, "OTP is invalid.", None
 
-        if datetime.now(tz=timezone.utc) > expires_at:
-            return False, "OTP has expired."
+        otp_data = otp_snapshot.to_dict()
+        if otp_has_expired(otp_data):
+            return False, "OTP has expired.", None
 
-        link_id = f"{main_user_id}_{support_user_id}"
+        main_user_id = otp_data["main_user_id"]
+        link_ref = gcp_firestore_db.collection("user_links").document(f"{main_user_id}_{support_user_id}")
+        main_user_ref = gcp_firestore_db.collection("users").document(main_user_id)
 
-        link_exists = firestore_db.collection("user_links").document(link_id).get().exists
+        snapshots = {snapshot.reference.path: snapshot for snapshot in transaction.get_all([link_ref, main_user_ref])}
+        if snapshots[link_ref.path].exists:
+            return False, "Users are already linked.", main_user_id
 
-        if link_exists:
-            return False, "Users are already linked."
+        main_user_snapshot = snapshots[main_user_ref.path]
+        if not main_user_snapshot.exists:
+            raise ValueError("User data does not exist in the database.")
 
-        main_user_data = get_user_data(main_user_id)
+        main_user_data = main_user_snapshot.to_dict()
         main_user_full_name = f"{main_user_data['first_name']} {main_user_data['last_name']}"
-        """
-        Additional logic for if the main user requires easy query for support users.
-        support_user_data = get_user_data(support_user_id)
-        support_user_full_name = f"{support_user_data['first_name']} {support_user_data['last_name']}"
-        """
 
-        firestore_db.collection("user_links").document(link_id).set({
+        transaction.set(link_ref, {
             "main_user": main_user_id,
             "support_user": support_user_id,
             "linked_at": datetime.now(tz=timezone.utc)
         })
-
-        supp_user_ref = firestore_db.collection("users").document(support_user_id)
-        supp_user_ref.set({
+        transaction.set(gcp_firestore_db.collection("users").document(support_user_id), {
             "linked_users": {
                 main_user_full_name: main_user_id
             }
         }, merge=True)
+        transaction.delete(otp_ref)
 
-        firestore_db.collection("one_time_codes").document(main_user_id).delete()
+        return True, "User linked successfully.", main_user_id
 
-        return True, "User linked successfully."
+    linked, message, main_user_id = redeem_code(gcp_firestore_db.transaction())
 
-    return False, "OTP is invalid."
+    if linked:
+        forget_document(firestore_db.collection("users").document(support_user_id))
+        forget_document(firestore_db.collection("user_links").document(f"{main_user_id}_{support_user_id}"))
+        invalidate_user_links(support_user_id)
+        invalidate_user_links(main_user_id)
 
-def get_linked_users(user_id: str):
+    return linked, message
+
+def sweep_expired_otps() -> int:
+    """
+        Deletes expired one time codes in batches, returns how many were deleted.
+    """
+    codes_ref = firestore_db.collection("one_time_codes")
+    deleted = 0
+    while True:
+        expired_codes = list(codes_ref.where("expires_at", "<", datetime.now(tz=timezone.utc)).select([]).limit(FIRESTORE_BATCH_LIMIT).stream())
+        if not expired_codes:
+            return deleted
+
+        batch = firestore_db.batch()
+        for code in expired_codes:
+            batch.delete(code.reference)
+        batch.commit()
+        deleted += len(expired_codes)
+
+otp_sweeper = PeriodicTask("otp-sweeper", sweep_expired_otps, interval=app_config.OTP_SWEEP_INTERVAL)
+
+def get_linked_users(user_id: str, use_cache: bool = True):
     """
         Given a user ID, retrieves the linked users from Firestore. The linked users are stored in a dictionary where the key is the user's full name and the value is the user's ID.
     """
+    if use_cache:
+        cached_linked_users = linked_users_cache.get(user_id)
+        if cached_linked_users is not None:
+            return dict(cached_linked_users)
 
-    user = firestore_db.collection("users").document(user_id).get()
+    user = get_document(firestore_db.collection("users").document(user_id))
     if not user.exists:
         raise ValueError("User data does not exist in the database.")
     
     user_data = user.to_dict()
-    return user_data.get("linked_users", {})
+    linked_users = user_data.get("linked_users", {})
+    remember_linked_users(user_id, linked_users)
+    return linked_users
 
-def get_verified_uid_from_user_name(support_user_uid: str, user_name: str) -> str:
+@dataclass(frozen=True)
+class SupportUserAuthorization:
     """
-        Given a the full name of a user from the frontend, retrieve the internal UID from firestore.
+        Result of authorizing a support user to act for a linked main user.
+    """
+    support_user_id: str
+    support_full_name: str
+    main_user_id: str
+    linked: bool
+
+def authorize_support_user(support_user_uid: str, main_user_name: str) -> SupportUserAuthorization:
+    """
+        Given a support user ID and the full name of a main user, resolves the support user's profile, the main user's UID and the link state.
+        Uses the link caches when possible, otherwise one get_all batch (main user known) or two parallel reads followed by the deletion job reads.
+        The deletion job reads are never cached across requests, since link caches on other instances outlive an account deletion.
+        Raises ValueError if the support user does not exist, the main user is not in their linked users, or either account is being deleted.
     """
     if support_user_uid is None:
         raise ValueError("Unauthorized. Please log in and try again.")
 
-    if user_name is None:
-        raise ValueError("User name is required.")
-    
-    linked_accounts = get_linked_users(support_user_uid)
+    if main_user_name is None:
+        raise ValueError("Main user name is required.")
+
+    user_ref = firestore_db.collection("users").document(support_user_uid)
+    links_ref = firestore_db.collection("user_links")
+    deletion_jobs_ref = firestore_db.collection("deletion_jobs")
+
+    cached_linked_users = linked_users_cache.get(support_user_uid)
+    if cached_linked_users is not None and main_user_name in cached_linked_users:
+        main_user_id = cached_linked_users[main_user_name]
+        deletion_job_refs = [deletion_jobs_ref.document(main_user_id), deletion_jobs_ref.document(support_user_uid)]
+        if link_state_cache.get((main_user_id, support_user_uid)):
+            user_snapshot, *deletion_jobs = get_documents([user_ref, *deletion_job_refs])
+            linked = True
+        else:
+            user_snapshot, link_snapshot, *deletion_jobs = get_documents([user_ref, links_ref.document(f"{main_user_id}_{support_user_uid}"), *deletion_job_refs])
+            linked = link_snapshot.exists
+    else:
+        # The main user's UID is not known yet, so read the profile and all of the support user's links in parallel.
+        user_future = read_executor.submit(user_ref.get)
+        links_future = read_executor.submit(lambda: list(links_ref.where("support_user", "==", support_user_uid).stream()))
+        user_snapshot = user_future.result()
+        link_snapshots = links_future.result()
+        remember_document(user_snapshot)
+
+        if not user_snapshot.exists:
+            raise ValueError("User data does not exist in the database.")
+
+        linked_users = user_snapshot.to_dict().get("linked_users", {})
+        remember_linked_users(support_user_uid, linked_users)
+        if main_user_name not in linked_users:
+            raise ValueError("User not linked to support user.")
+
+        main_user_id = linked_users[main_user_name]
+        linked = any(link.get("main_user") == main_user_id for link in link_snapshots)
+        deletion_jobs = get_documents([deletion_jobs_ref.document(main_user_id), deletion_jobs_ref.document(support_user_uid)])
+
+    if not user_snapshot.exists:
+        raise ValueError("User data does not exist in the database.")
 
-    if user_name not in linked_accounts:
-        raise ValueError("User not linked to support user.")
-    
-    return linked_accounts[user_name]
+    if any(deletion_job.exists for deletion_job in deletion_jobs):
+        raise ValueError("User account is being deleted.")
 
-def verify_user_link(support_user_uid: str, main_user_id: str) -> bool:
-    """
-        Given a support user ID and a main user ID, verifies if the user is linked.
-    """
-    link_id = f"{main_user_id}_{support_user_uid}"
-    link_exists = firestore_db.collection("user_links").document(link_id).get().exists
+    if linked:
+        link_state_cache.set((main_user_id, support_user_uid), True)
 
-    return link_exists
+    user_data = user_snapshot.to_dict()
+    return SupportUserAuthorization(
+        support_user_id=support_user_uid,
+        support_full_name=f"{user_data.get('first_name')} {user_data.get('last_name')}",
+        main_user_id=main_user_id,
+        linked=linked
+    )
 
-def get_random_indexed_media(user_id: str, visited_indices: list[int]) -> dict:
+def sample_unvisited_indices(media_count: int, visited_indices: list[int], count: int) -> list[int]:
     """
-        Given a user ID, retrieves a random image from the user's images that has not been visited before.
+        Samples up to count distinct indices from range(media_count) that are not in visited_indices, in random order.
+        Uses Floyd's algorithm over the ranks of the unvisited indices, so it never builds the full range.
+    """
+    sorted_visited = sorted({index for index in visited_indices if 0 <= index < media_count})
+    available_count = media_count - len(sorted_visited)
+    count = min(count, available_count)
+
+    sampled_ranks = set()
+    for upper in range(available_count - count, available_count):
+        rank = random.randint(0, upper)
+        sampled_ranks.add(upper if rank in sampled_ranks else rank)
+
+    indices = []
+    for rank in sampled_ranks:
+        # The rank-th unvisited index is rank shifted past every visited index at or below it.
+        index = rank
+        for visited_index in sorted_visited:
+            if visited_index > index:
+                break
+            index += 1
+        indices.append(index)
+
+    random.shuffle(indices)
+    return indices
+
+def get_random_indexed_media_batch(user_id: str, count: int, visited_indices: list[int] | None = None) -> list[dict]:
     """
-    user_doc = firestore_db.collection("uploads").document(user_id).get()
+        Given a user ID, retrieves up to count random images from the user's images that have not been visited before.
+        Reads the media counter once, fetches the sampled documents with chunked `in` queries in parallel, and signs their URLs concurrently.
+    """
+    visited_indices = visited_indices or []
+    uploads_ref = firestore_db.collection("uploads").document(user_id)
 
-    media_count = user_doc.get("media_counter") or 0
+    user_doc = uploads_ref.get()
+    media_count = (user_doc.get("media_counter") if user_doc.exists else 0) or 0
     if media_count == 0:
         raise ValueError("No media found for user.")
-    
-    available_indices = set(range(media_count)) - set(visited_indices)
 
-    if not available_indices:
+    sampled_indices = sample_unvisited_indices(media_count, visited_indices, count)
+    if not sampled_indices:
         raise ValueError("All media has been visited.")
-    
-    random_index = random.choice(list(available_indices))
 
-    query = firestore_db.collection("uploads").document(user_id).collection("user_uploads").where("media_index", "==", random_index).limit(1)
+    user_uploads_ref = uploads_ref.collection("user_uploads")
+    index_chunks = [sampled_indices[i:i + FIRESTORE_IN_QUERY_LIMIT] for i in range(0, len(sampled_indices), FIRESTORE_IN_QUERY_LIMIT)]
+    chunk_results = read_executor.map(
+        lambda chunk: list(user_uploads_ref.where("media_index", "in", chunk).stream()),
+        index_chunks
+    )
+
+    media_by_index = {}
+    for docs in chunk_results:
+        for doc in docs:
+            media = doc.to_dict()
+            media_by_index.setdefault(media["media_index"], media)
+
+    # Keep the random sample order, skipping indices with no document.
+    media_list = [media_by_index[index] for index in sampled_indices if index in media_by_index]
+    if not media_list:
+        raise ValueError("Media not found.")
+
+    signed_urls = sign_urls([media["destination_path"] for media in media_list], timedelta(days=1))
 
-    docs = list(query.stream())
+    return [
+        {
+            "signed_url": signed_url,
+            "destination_path": media["destination_path"],
+            "approx_date_taken": media["approx_date_taken"],
+            "description": media["description"],
+            "media_index": media["media_index"]
+        }
+        for media, signed_url in zip(media_list, signed_urls)
+    ]
 
-    if not docs:
-        raise ValueError("Media not found.")
-    
-    media = docs[0].to_dict()
-    destination_path = media["destination_path"]
-    signed_url = generate_per_file_signed_url(destination_path)
-
-    required_media_data = {
-        "signed_url": signed_url,
-        "destination_path": destination_path,
-        "approx_date_taken": media["approx_date_taken"],
-        "description": media["description"],
-        "media_index": media["media_index"]
-    }
+def get_random_indexed_media(user_id: str, visited_indices: list[int]) -> dict:
+    """
+        Given a user ID, retrieves a random image from the user's images that has not been visited before.
+    """
+    return get_random_indexed_media_batch(user_id, 1, visited_indices)[0]
 
-    return required_media_data
+def get_exercise_rollup_ref(user_id: str, exercise_name: str, timestamp: datetime):
+    """
+        Given an attempt's user, exercise and timestamp, returns the reference of its per-user, per-exercise, per-day (UTC) rollup document.
+    """
+    day = timestamp.astimezone(timezone.utc).strftime("%Y-%m-%d")
+    return firestore_db.collection("exercise_rollups").document(user_id).collection("days").document(f"{exercise_name}_{day}")
+
+def build_exercise_rollup_update(user_id: str, exercise_name: str, timestamp: datetime, accuracies: list[float], reaction_times: list[float]) -> dict:
+    """
+        Given one or more attempts for the same exercise and day, builds the merge update that folds them into the rollup document.
+        Counts and sums use Increment and extremes use Minimum/Maximum transforms, so concurrent writers never lose updates.
+    """
+    day_start = timestamp.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return {
+        "user_id": user_id,
+        "exercise_name": exercise_name,
+        "date": day_start,
+        "count": firestore.Increment(len(accuracies)),
+        "accuracy_sum": firestore.Increment(sum(accuracies)),
+        "accuracy_min": firestore.Minimum(min(accuracies)),
+        "accuracy_max": firestore.Maximum(max(accuracies)),
+        "reaction_time_sum": firestore.Increment(sum(reaction_times)),
+        "reaction_time_min": firestore.Minimum(min(reaction_times)),
+        "reaction_time_max": firestore.Maximum(max(reaction_times))
+    }
 
 def store_exercise_data(exercise_name: str, timestamp: datetime, accuracy: float, avg_reaction_time: float, user_id: str) -> None:
     """
         Given exercise data, store the data in firestore for each exercise for the user.
+        The attempt and its daily rollup are written atomically in one batch.
     """
     try:
         exercise_ref = firestore_db.collection("exercises").document(exercise_name).collection("user_attempts").document(user_id).collection("attempts").document()
@@ -257,34 +627,177 @@ def store_exercise_data(exercise_name: str, timestamp: datetime, accuracy: float
             'avg_reaction_time': avg_reaction_time
         }
 
-        exercise_ref.set(exercise_data)
+        batch = firestore_db.batch()
+        batch.set(exercise_ref, exercise_data)
+        batch.set(
+            get_exercise_rollup_ref(user_id, exercise_name, timestamp),
+            build_exercise_rollup_update(user_id, exercise_name, timestamp, [accuracy], [avg_reaction_time]),
+            merge=True
+        )
+        batch.commit()
     except Exception as e:
         raise RuntimeError(f"Error storing exercise data: {e}")
-    
-def get_exercise_data(user_id: str) -> list[dict]:
-    all_attempts = []
-    try:
-        attempts_group_ref = firestore_db.collection_group("attempts")
-        query = attempts_group_ref.where("user_id", "==", user_id).order_by("timestamp", direction="DESCENDING")
 
-        for attempt in query.stream():
-            attempt_data = attempt.to_dict()
+def store_exercise_data_bulk(attempts: list[dict], user_id: str) -> list[dict]:
+    """
+        Given validated attempts (see utils.validators.parse_exercise_attempt), stores them in chunked batched writes.
+        Attempts are grouped by (exercise, day) so each batch updates every rollup it touches once, alongside its attempts, and stays within the 500 write limit.
+        Returns one status per attempt, in input order: {"status": "created", "id": ...} or {"status": "failed", "error": ...}.
+    """
+    order = sorted(range(len(attempts)), key=lambda i: (attempts[i]["exercise_name"], get_exercise_rollup_ref(user_id, attempts[i]["exercise_name"], attempts[i]["timestamp"]).id))
+
+    # Pack attempts into chunks where attempts + distinct rollups <= FIRESTORE_BATCH_LIMIT.
+    chunks, chunk, chunk_rollups = [], [], set()
+    for i in order:
+        rollup_id = get_exercise_rollup_ref(user_id, attempts[i]["exercise_name"], attempts[i]["timestamp"]).id
+        new_rollup = rollup_id not in chunk_rollups
+        if len(chunk) + len(chunk_rollups) + 1 + new_rollup > FIRESTORE_BATCH_LIMIT:
+            chunks.append(chunk)
+            chunk, chunk_rollups = [], set()
+            new_rollup = True
+        chunk.append(i)
+        chunk_rollups.add(rollup_id)
+    if chunk:
+        chunks.append(chunk)
+
+    results: list[dict] = [{} for _ in attempts]
+    for chunk in chunks:
+        batch = firestore_db.batch()
+        rollups = {}
+        doc_ids = {}
+
+        for i in chunk:
+            attempt = attempts[i]
+            exercise_ref = firestore_db.collection("exercises").document(attempt["exercise_name"]).collection("user_attempts").document(user_id).collection("attempts").document()
+            batch.set(exercise_ref, {
+                'user_id': user_id,
+                'exercise_name': attempt["exercise_name"],
+                'timestamp': attempt["timestamp"],
+                'accuracy': attempt["accuracy"],
+                'avg_reaction_time': attempt["avg_reaction_time"]
+            })
+            doc_ids[i] = exercise_ref.id
+
+            rollup_ref = get_exercise_rollup_ref(user_id, attempt["exercise_name"], attempt["timestamp"])
+            rollup = rollups.setdefault(rollup_ref.path, {"ref": rollup_ref, "attempt": attempt, "accuracies": [], "reaction_times": []})
+            rollup["accuracies"].append(attempt["accuracy"])
+            rollup["reaction_times"].append(attempt["avg_reaction_time"])
+
+        for rollup in rollups.values():
+            batch.set(
+                rollup["ref"],
+                build_exercise_rollup_update(user_id, rollup["attempt"]["exercise_name"], rollup["attempt"]["timestamp"], rollup["accuracies"], rollup["reaction_times"]),
+                merge=True
+            )
+
+        try:
+            batch.commit()
+            for i in chunk:
+                results[i] = {"status": "created", "id": doc_ids[i]}
+        except Exception as e:
+            for i in chunk:
+                results[i] = {"status": "failed", "error": f"Error storing exercise data: {e}"}
+
+    return results
+
+def get_exercise_rollups(user_id: str, start: datetime | None = None, end: datetime | None = None, exercise_name: str | None = None) -> list[dict]:
+    """
+        Given a user ID, retrieves the user's daily exercise rollups, oldest first. Reads O(days) documents instead of every attempt.
+        start/end select the days overlapping [start, end) and exercise_name limits it to one exercise; both are pushed down into the query.
+    """
+    try:
+        query = firestore_db.collection("exercise_rollups").document(user_id).collection("days")
 
-            timestamp = attempt_data.get("timestamp")
-            if hasattr(timestamp, 'to_datetime'):
-                attempt_data["timestamp"] = timestamp.to_datetime().replace(tz=timezone.utc)
-            elif isinstance(timestamp, datetime):
-                attempt_data["timestamp"] = timestamp
+        if exercise_name is not None:
+            query = query.where("exercise_name", "==", exercise_name)
+        if start is not None:
+            query = query.where("date", ">=", start.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0))
+        if end is not None:
+            query = query.where("date", "<", end)
 
-            all_attempts.append(attempt_data)
-        
-        return all_attempts
+        return [rollup.to_dict() for rollup in query.order_by("date").stream()]
     except Exception as e:
-        raise RuntimeError(f"Error retrieving exercise data: {e}")
+        raise RuntimeError(f"Error retrieving exercise rollups: {e}")
+
+def backfill_exercise_rollups() -> int:
+    """
+        Rebuilds every exercise rollup document from the raw attempts. Rollups are overwritten, so this is safe to re-run,
+        but attempts stored while it runs may be missed and should be backfilled again. Returns how many rollup documents were written.
+    """
+    rollups = {}
+    for attempt in firestore_db.collection_group("attempts").stream():
+        attempt_data = attempt.to_dict()
+        if "accuracy" not in attempt_data or "avg_reaction_time" not in attempt_data:
+            continue
+
+        rollup_ref = get_exercise_rollup_ref(attempt_data["user_id"], attempt_data["exercise_name"], attempt_data["timestamp"])
+        rollup = rollups.setdefault(rollup_ref.path, {
+            "ref": rollup_ref,
+            "user_id": attempt_data["user_id"],
+            "exercise_name": attempt_data["exercise_name"],
+            "date": attempt_data["timestamp"].astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0),
+            "accuracies": [],
+            "reaction_times": []
+        })
+        rollup["accuracies"].append(attempt_data["accuracy"])
+        rollup["reaction_times"].append(attempt_data["avg_reaction_time"])
+
+    rollup_list = list(rollups.values())
+    for start in range(0, len(rollup_list), FIRESTORE_BATCH_LIMIT):
+        batch = firestore_db.batch()
+        for rollup in rollup_list[start:start + FIRESTORE_BATCH_LIMIT]:
+            batch.set(rollup["ref"], {
+                "user_id": rollup["user_id"],
+                "exercise_name": rollup["exercise_name"],
+                "date": rollup["date"],
+                "count": len(rollup["accuracies"]),
+                "accuracy_sum": sum(rollup["accuracies"]),
+                "accuracy_min": min(rollup["accuracies"]),
+                "accuracy_max": max(rollup["accuracies"]),
+                "reaction_time_sum": sum(rollup["reaction_times"]),
+                "reaction_time_min": min(rollup["reaction_times"]),
+                "reaction_time_max": max(rollup["reaction_times"])
+            })
+        batch.commit()
+
+    return len(rollup_list)
     
+def get_journal_calendar_ref(user_id: str, timestamp: datetime):
+    """
+        Given a journal entry's user and timestamp, returns the reference of its per-month calendar index document (journals/{uid}/calendar/{YYYY-MM}).
+        Calendar months and days are UTC, like the stored timestamps, so live writes and backfills bucket an entry the same way.
+    """
+    month = timestamp.astimezone(timezone.utc).strftime("%Y-%m")
+    return firestore_db.collection("journals").document(user_id).collection("calendar").document(month)
+
+def summarize_journal_days(timestamps: list[datetime]) -> dict:
+    """
+        Given entry timestamps in the same UTC month, returns {DD: {"count", "latest"}} keyed by UTC day, with latest as epoch seconds.
+    """
+    days = {}
+    for timestamp in timestamps:
+        day = days.setdefault(timestamp.astimezone(timezone.utc).strftime("%d"), {"count": 0, "latest": timestamp.timestamp()})
+        day["count"] += 1
+        day["latest"] = max(day["latest"], timestamp.timestamp())
+    return days
+
+def build_journal_calendar_update(timestamps: list[datetime]) -> dict:
+    """
+        Given one or more entry timestamps in the same UTC month, builds the merge update that folds them into the calendar document.
+        Per-day counts use Increment and the latest entry time (epoch seconds, as Maximum only accepts numbers) uses Maximum.
+    """
+    return {
+        "month": timestamps[0].astimezone(timezone.utc).strftime("%Y-%m"),
+        "days": {
+            day: {"count": firestore.Increment(values["count"]), "latest": firestore.Maximum(values["latest"])}
+            for day, values in summarize_journal_days(timestamps).items()
+        }
+    }
+
 def store_journal_entries(entry: str, timestamp: datetime, destination_path: str, user_id: str) -> None:
     """
         Given journal entry data, store the data in firestore for each exercise for the user.
+        The entry and its month's calendar index are written atomically in one batch.
     """
     try:
         journal_ref = firestore_db.collection("journals").document(user_id).collection("entries").document()
@@ -295,32 +808,115 @@ def store_journal_entries(entry: str, timestamp: datetime, destination_path: str
             'destination_path': destination_path
         }
 
-        journal_ref.set(journal_data)
+        batch = firestore_db.batch()
+        batch.set(journal_ref, journal_data)
+        batch.set(get_journal_calendar_ref(user_id, timestamp), build_journal_calendar_update([timestamp]), merge=True)
+        batch.commit()
     except Exception as e:
         raise RuntimeError(f"Error storing journal entry: {e}")
 
-def get_journal_entries(user_id: str, date: datetime) -> list[dict]:
+def get_journal_calendar(user_id: str, month: str) -> list[dict]:
     """
-        Given a user ID, retrieves the journal entries from Firestore.
+        Given a user ID and a month (YYYY-MM), returns the days of that month that have journal entries, with their entry count
+        and latest entry time, from a single calendar document read. Days are UTC days.
     """
     try:
+        month_start = datetime.strptime(month, "%Y-%m")
+    except (TypeError, ValueError):
+        raise ValueError("Invalid month format, expected YYYY-MM.")
 
-        if date is None:
-            raise ValueError("Date is required.")
-        
-        start_of_day = date.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_of_day = start_of_day + timedelta(days=1)
-
-        journal_ref = firestore_db.collection("journals").document(user_id).collection("entries")
-        query = (
-            journal_ref.where("timestamp", ">=", start_of_day)
-            .where("timestamp", "<", end_of_day)
-            .order_by("timestamp", direction="DESCENDING")
-        )
+    try:
+        calendar = firestore_db.collection("journals").document(user_id).collection("calendar").document(month_start.strftime("%Y-%m")).get()
+    except Exception as e:
+        raise RuntimeError(f"Error retrieving journal calendar: {e}")
 
-        entry_list = []
+    if not calendar.exists:
+        return []
+
+    days = calendar.to_dict().get("days", {})
+    return [
+        {
+            "date": f"{month_start.strftime('%Y-%m')}-{day}",
+            "count": values.get("count", 0),
+            "latest": datetime.fromtimestamp(values["latest"], timezone.utc).isoformat() if values.get("latest") is not None else None
+        }
+        for day, values in sorted(days.items())
+    ]
 
-        for entry in query.stream():
+def backfill_journal_calendars() -> int:
+    """
+        Rebuilds every user's journal calendar documents from their entries, bucketed by UTC day like live writes.
+        Calendars are overwritten, so this is safe to re-run. Returns how many calendar documents were written.
+    """
+    calendars = {}
+    for journal_ref in firestore_db.collection("journals").list_documents():
+        for entry in journal_ref.collection("entries").select(["timestamp"]).stream():
+            timestamp = entry.get("timestamp")
+            if timestamp is None:
+                continue
+            calendar_ref = get_journal_calendar_ref(journal_ref.id, timestamp)
+            calendars.setdefault(calendar_ref.path, {"ref": calendar_ref, "timestamps": []})["timestamps"].append(timestamp)
+
+    calendar_list = list(calendars.values())
+    for start in range(0, len(calendar_list), FIRESTORE_BATCH_LIMIT):
+        batch = firestore_db.batch()
+        for calendar in calendar_list[start:start + FIRESTORE_BATCH_LIMIT]:
+            batch.set(calendar["ref"], {
+                "month": calendar["timestamps"][0].astimezone(timezone.utc).strftime("%Y-%m"),
+                "days": summarize_journal_days(calendar["timestamps"])
+            })
+        batch.commit()
+
+    return len(calendar_list)
+
+def get_journal_entries(user_id: str, start: datetime, end: datetime, limit: int | None = None, page_token: str | None = None) -> tuple[list[dict], str | None]:
+    """
+        Given a user ID and a [start, end) range (a day, week or month view), retrieves the journal entries from Firestore, newest first.
+        Without limit/page_token every entry in the range is returned (legacy behaviour). Otherwise entries are paged by (timestamp, document id).
+        The entries' URLs are signed concurrently. Returns the entries and the token for the next page (None when there are no more).
+    """
+    if start is None or end is None:
+        raise ValueError("Start and end of the range are required.")
+    if start >= end:
+        raise ValueError("Start of the range must be before its end.")
+    if end - start > timedelta(days=JOURNAL_MAX_RANGE_DAYS):
+        raise ValueError(f"Range cannot be longer than {JOURNAL_MAX_RANGE_DAYS} days.")
+
+    journal_ref = firestore_db.collection("journals").document(user_id).collection("entries")
+    query = (
+        journal_ref.where("timestamp", ">=", start)
+        .where("timestamp", "<", end)
+        .order_by("timestamp", direction="DESCENDING")
+        .order_by(firestore.FieldPath.document_id(), direction="DESCENDING")
+    )
+
+    paged = limit is not None or page_token is not None
+    limit = limit or JOURNAL_PAGE_SIZE
+
+    if page_token is not None:
+        cursor = decode_page_token(page_token)
+        try:
+            query = query.start_after({
+                "timestamp": datetime.fromisoformat(cursor["timestamp"]),
+                "__name__": cursor["id"]
+            })
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Invalid page token.")
+
+    try:
+        # When paging, fetch one extra document to know whether another page exists.
+        entries = list((query.limit(limit + 1) if paged else query).stream())
+
+        next_page_token = None
+        if paged and len(entries) > limit:
+            entries = entries[:limit]
+            next_page_token = encode_page_token({
+                "timestamp": entries[-1].get("timestamp").isoformat(),
+                "id": entries[-1].id
+            })
+
+        entry_list = []
+        for entry in entries:
             entry_dict = entry.to_dict()
             timestamp = entry_dict.get("timestamp")
             if hasattr(timestamp, 'to_datetime'):
@@ -328,11 +924,14 @@ def get_journal_entries(user_id: str, date: datetime) -> list[dict]:
             elif isinstance(timestamp, datetime):
                 entry_dict["timestamp"] = timestamp
 
-            entry_dict["signed_url"] = generate_per_file_signed_url(entry_dict["destination_path"])
-            
+            entry_dict["id"] = entry.id
             entry_list.append(entry_dict)
 
-        return entry_list
+        signed_urls = sign_urls([entry_dict["destination_path"] for entry_dict in entry_list], timedelta(days=1))
+        for entry_dict, signed_url in zip(entry_list, signed_urls):
+            entry_dict["signed_url"] = signed_url
+
+        return entry_list, next_page_token
     except Exception as e:
         raise RuntimeError(f"Error retrieving journal entries: {e}")
     
\ No newline at end of file
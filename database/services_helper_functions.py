@@ -3,55 +3,96 @@
 """
 from google.cloud import vision, firestore
 from vertexai.generative_models import GenerativeModel, Part
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import Dict, Any
-from datetime import datetime, timedelta
+from datetime import timedelta
+import logging
+import threading
+import time
 import vertexai
 
 from firebase.initialize import firestore_db, gcp_firestore_db, bucket, vision_client
 from config import app_config
+from utils.cache import TTLCache
+from utils.formatters import encode_page_token, decode_page_token
 # from utils.validators import validate_ai_content
 
 """
     Firestore Helper Functions
 """
-def store_upload_metadata(metadata: dict) -> None:
+def reserve_media_indices(main_user_id: str, count: int) -> int:
     """
-        Given metadata, stores the metadata in Firestore.
+        Given a user ID, reserves count consecutive media indices in one transaction on the user's media counter. Returns the first index.
+        Indices of uploads that later fail are left unused; random media sampling skips indices with no document.
     """
     try:
-        main_user_id = metadata['main_user_id']
-
         user_ref = gcp_firestore_db.collection("uploads").document(main_user_id)
-        upload_ref = user_ref.collection("user_uploads")
 
         transaction = gcp_firestore_db.transaction()
 
         @firestore.transactional
         def transaction_function(transaction):
             snapshot = user_ref.get(transaction=transaction)
-            media_counter = snapshot.get("media_counter") or 0
+            media_counter = (snapshot.get("media_counter") if snapshot.exists else 0) or 0
 
-            metadata['media_index'] = media_counter
+            transaction.set(user_ref, {"media_counter": media_counter + count}, merge=True)
+            return media_counter
 
-            transaction.set(user_ref, {"media_counter": media_counter + 1}, merge=True)
+        return transaction_function(transaction)
 
-            upload_ref.add(metadata)
+    except Exception as e:
+        raise RuntimeError(f"Error reserving media indices: {e}")
 
-        transaction_function(transaction)       
+def store_upload_metadata(metadata: dict) -> str:
+    """
+        Given metadata with a media_index reserved by reserve_media_indices, stores the upload document in Firestore.
+        Returns the upload document's path.
+    """
+    try:
+        upload_doc_ref = firestore_db.collection("uploads").document(metadata['main_user_id']).collection("user_uploads").document()
+        upload_doc_ref.set(metadata)
+        return upload_doc_ref.path
 
     except Exception as e:
         raise RuntimeError(f"Error storing upload metadata: {e}")
 
-# TODO: Implement pagination for user images if needed.
-def get_user_media(user_id: str):
+MEDIA_PAGE_SIZE = 100
+MEDIA_MAX_PAGE_SIZE = 200
+
+def get_user_media(user_id: str, limit: int | None = None, page_token: str | None = None) -> tuple[list[dict], str | None]:
     """
-        Given a user ID, retrieves the user's images from Firestore.
+        Given a user ID, retrieves the user's images from Firestore, newest first.
+        Only the fields used by the gallery are fetched (the analysis blob is projected down to quick_access).
+        Without limit/page_token every image is returned (legacy behaviour). Otherwise images are paged by (uploaded_at, document id).
+        Returns the media and the token for the next page (None when there are no more).
     """
     collection_ref = firestore_db.collection("uploads").document(user_id).collection("user_uploads")
 
-    query = collection_ref.order_by("uploaded_at", direction="DESCENDING")
+    query = (
+        collection_ref.select(["destination_path", "support_user_name", "uploaded_at", "analysis.analysis.quick_access"])
+        .order_by("uploaded_at", direction="DESCENDING")
+        .order_by(firestore.FieldPath.document_id(), direction="DESCENDING")
+    )
+
+    next_page_token = None
+    if limit is None and page_token is None:
+        results = list(query.stream())
+    else:
+        limit = limit or MEDIA_PAGE_SIZE
+
+        if page_token is not None:
+            cursor = decode_page_token(page_token)
+            try:
+                query = query.start_after({"uploaded_at": cursor["uploaded_at"], "__name__": cursor["id"]})
+            except (KeyError, TypeError):
+                raise ValueError("Invalid page token.")
+
+        # Fetch one extra document to know whether another page exists.
+        results = list(query.limit(limit + 1).stream())
 
-    results = query.stream()
+        if len(results) > limit:
+            results = results[:limit]
+            next_page_token = encode_page_token({"uploaded_at": results[-1].get("uploaded_at"), "id": results[-1].id})
 
     media = []
     for doc in results:
@@ -69,61 +110,236 @@ def get_user_media(user_id: str):
 
         media.append(item)
 
-
-    return media
+    return media, next_page_token
 
 
 """
     Firebase Storage Helper Functions
 """
-def generate_per_file_signed_url(destination_path: str, expiration=1) -> str:
+"""
+    Signed URL cache keyed by (destination_path, method, lifetime in seconds).
+    Entries are cached for the part of their lifetime above SIGNED_URL_MIN_REMAINING_FRACTION, so a URL handed back always has at least that fraction left.
+"""
+signed_url_cache = TTLCache(max_size=app_config.SIGNED_URL_CACHE_MAX_SIZE)
+
+def get_signed_url(destination_path: str, expiration: timedelta, method: str = "GET") -> str:
     """
-        Given a media file, generates a signed URL for the file. Signed URLs expire after 1 day.
+        Given a blob path, returns a V4 signed URL for it, reusing a cached URL while enough of its lifetime remains.
     """
-    try:
-        blob = bucket.blob(destination_path)
-        signed_url = blob.generate_signed_url(
-            version="v4",
-            expiration=timedelta(days=expiration),
-            method="GET"
-        )
+    signed_url = signed_url_cache.get((destination_path, method, int(expiration.total_seconds())))
+    if signed_url is not None:
         return signed_url
-    except Exception as e:
-        raise RuntimeError(f"Error generating signed URL: {e}")
-    
+
+    return sign_and_cache_url(destination_path, expiration, method)
+
+def sign_and_cache_url(destination_path: str, expiration: timedelta, method: str = "GET") -> str:
+    """
+        Signs a V4 URL for the blob without checking the cache first, and caches the result. Used after a cache miss has already been counted.
+    """
+    lifetime = int(expiration.total_seconds())
+
+    blob = bucket.blob(destination_path)
+    signed_url = blob.generate_signed_url(
+        version="v4",
+        expiration=expiration,
+        method=method
+    )
+
+    signed_url_cache.set((destination_path, method, lifetime), signed_url, ttl=lifetime * (1 - app_config.SIGNED_URL_MIN_REMAINING_FRACTION))
+    return signed_url
+
+"""
+    Parallel signing engine. Signing can go through the IAM signBlob API when no local key is available, so uncached URLs are signed
+    on a shared bounded pool, with a per-request concurrency limit and time budget.
+"""
+signing_executor = ThreadPoolExecutor(max_workers=app_config.SIGNING_POOL_SIZE, thread_name_prefix="url-signing")
+
+def sign_urls(destination_paths: list[str], expiration: timedelta, max_concurrency: int | None = None, time_budget: float | None = None) -> list[str | None]:
+    """
+        Given blob paths, returns their signed URLs in the same order. Cached URLs are returned directly, the rest are signed concurrently.
+        At most max_concurrency signatures run at once for this call. URLs that fail or are not signed within time_budget seconds are None.
+    """
+    max_concurrency = max_concurrency or app_config.SIGNING_MAX_CONCURRENCY
+    deadline = time.monotonic() + (time_budget if time_budget is not None else app_config.SIGNING_TIME_BUDGET)
+    lifetime = int(expiration.total_seconds())
+
+    signed_urls: list[str | None] = [None] * len(destination_paths)
+    pending = []
+    for position, destination_path in enumerate(destination_paths):
+        cached_url = signed_url_cache.get((destination_path, "GET", lifetime))
+        if cached_url is not None:
+            signed_urls[position] = cached_url
+        else:
+            pending.append(position)
+
+    if not pending:
+        return signed_urls
+
+    slots = threading.BoundedSemaphore(max_concurrency)
+    futures = {}
+    for position in pending:
+        if not slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            break
+        future = signing_executor.submit(sign_and_cache_url, destination_paths[position], expiration)
+        future.add_done_callback(lambda _: slots.release())
+        futures[future] = position
+
+    done, not_done = wait(futures, timeout=max(deadline - time.monotonic(), 0))
+    for future in not_done:
+        future.cancel()
+
+    for future in done:
+        try:
+            signed_urls[futures[future]] = future.result()
+        except Exception as e:
+            logging.error(f"Error generating signed URL for {destination_paths[futures[future]]}: {e}")
+
+    unsigned = len(destination_paths) - sum(url is not None for url in signed_urls)
+    if unsigned:
+        logging.warning(f"{unsigned} of {len(destination_paths)} signed URLs were not generated within the signing budget.")
+
+    return signed_urls
+
 
 """
     Image Analysis Helper Functions
 """
 vertexai.init(project=app_config.FIREBASE_PROJECT_ID, location="us-central1")
 
+GEMINI_MODEL_NAME = "gemini-2.0-flash-001"
+
+# Vision batches are limited to 16 images per request.
+VISION_BATCH_LIMIT = 16
 
-def analyze_image(gcs_uri: str, mime_type: str, description: str = "") -> Dict[str, Any]:
+# Shared by every analysis job; batch jobs also cap their own Gemini calls at ANALYSIS_GEMINI_CONCURRENCY.
+analysis_call_executor = ThreadPoolExecutor(max_workers=app_config.ANALYSIS_CALL_POOL_SIZE, thread_name_prefix="image-analysis-call")
+
+_generative_model = None
+_generative_model_lock = threading.Lock()
+
+def get_generative_model() -> GenerativeModel:
     """
-        Analyze an image using Vision API and Vertex AI.
+        Returns the shared Gemini model client, created on first use.
     """
-    try:
-        vision_results = analyze_with_vision(gcs_uri)
-        
-        vertex_results = analyze_with_vertex(gcs_uri, mime_type, description)
-        
-        combined_results = process_results(vision_results, vertex_results)
-        
-        return {
-            'status': 'completed',
-            'analysis': combined_results,
-            'analyzed_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-    except Exception as e:
-        print(f"Error analyzing image: {str(e)}")
-        return {
-            'status': 'error',
-            'error': str(e)
-        }
+    global _generative_model
+    if _generative_model is None:
+        with _generative_model_lock:
+            if _generative_model is None:
+                _generative_model = GenerativeModel(GEMINI_MODEL_NAME)
+    return _generative_model
+
+def remaining_time(deadline: float | None) -> float | None:
+    """
+        Given a time.monotonic() deadline, returns the seconds left for an RPC timeout (None if there is no deadline).
+        Raises TimeoutError if the deadline has already passed, so a queued call is not started at all.
+    """
+    if deadline is None:
+        return None
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError("Analysis deadline passed before the call started.")
+    return remaining
+
+def rpc_timeout_kwargs(deadline: float | None) -> Dict[str, float]:
+    timeout = remaining_time(deadline)
+    return {} if timeout is None else {"timeout": timeout}
+
+def collect_call_result(future, time_budget: float) -> tuple[Any, str | None]:
+    """
+        Given a finished (or abandoned) call's future, returns (result, None) or (None, error message).
+    """
+    if future is None or not future.done():
+        # A call that was never submitted, or that is still running, counts as timed out.
+        if future is not None:
+            future.cancel()
+        return None, f"Timed out after {time_budget} seconds."
+    if future.exception() is not None:
+        return None, str(future.exception())
+    return future.result(), None
+
+def combine_analysis(gcs_uri: str, vision_results: Dict[str, Any] | None, vertex_text: str | None, errors: Dict[str, str]) -> Dict[str, Any]:
+    """
+        Combines whichever sides succeeded, marking the result partial if one side failed. Raises if both sides failed.
+    """
+    if vision_results is None and vertex_text is None:
+        raise RuntimeError(f"Image analysis failed: {errors}")
+
+    combined_results = process_results(vision_results, vertex_text)
+    if errors:
+        logging.warning(f"Partial image analysis for {gcs_uri}: {errors}")
+        combined_results['partial'] = True
+        combined_results['errors'] = errors
+
+    return combined_results
+
+def run_image_analysis(gcs_uri: str, mime_type: str, description: str = "", client=None, model=None, time_budget: float | None = None) -> Dict[str, Any]:
+    """
+        Analyze an image using Vision API and Vertex AI concurrently and combine the results. Both calls share one deadline of time_budget seconds.
+        If one side fails or misses the deadline the other side's results are kept (marked partial); raises only if both sides fail.
+        client/model default to the shared Vision client and Gemini model, and can be replaced with fakes for testing.
+    """
+    time_budget = time_budget if time_budget is not None else app_config.ANALYSIS_TIME_BUDGET
+    deadline = time.monotonic() + time_budget
+
+    vision_future = analysis_call_executor.submit(analyze_with_vision, gcs_uri, client, deadline)
+    vertex_future = analysis_call_executor.submit(analyze_with_vertex, gcs_uri, mime_type, description, model, deadline)
+    wait([vision_future, vertex_future], timeout=time_budget)
 
-def analyze_with_vision(gcs_uri: str) -> Dict[str, Any]:
+    errors = {}
+    vision_results, errors["vision"] = collect_call_result(vision_future, time_budget)
+    vertex_text, errors["vertex"] = collect_call_result(vertex_future, time_budget)
+
+    return combine_analysis(gcs_uri, vision_results, vertex_text, {side: error for side, error in errors.items() if error})
+
+def run_image_analysis_batch(images: list[tuple[str, str, str]], client=None, model=None, time_budget: float | None = None) -> list[Dict[str, Any] | Exception]:
+    """
+        Given up to VISION_BATCH_LIMIT (gcs_uri, mime_type, description) tuples, analyzes them with one batched Vision request
+        and Gemini calls (at most ANALYSIS_GEMINI_CONCURRENCY at once) under one shared deadline.
+        Returns each image's combined results, or the exception if both sides failed for it.
     """
-        Analyze image with Vision API
+    time_budget = time_budget if time_budget is not None else app_config.ANALYSIS_TIME_BUDGET
+    deadline = time.monotonic() + time_budget
+
+    vision_future = analysis_call_executor.submit(analyze_with_vision_batch, [gcs_uri for gcs_uri, _, _ in images], client, deadline)
+    slots = threading.BoundedSemaphore(app_config.ANALYSIS_GEMINI_CONCURRENCY)
+    vertex_futures = []
+    for gcs_uri, mime_type, description in images:
+        if not slots.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            vertex_futures.append(None)
+            continue
+        future = analysis_call_executor.submit(analyze_with_vertex, gcs_uri, mime_type, description, model, deadline)
+        future.add_done_callback(lambda _: slots.release())
+        vertex_futures.append(future)
+
+    wait([vision_future, *[future for future in vertex_futures if future is not None]], timeout=max(deadline - time.monotonic(), 0))
+
+    vision_batch, vision_error = collect_call_result(vision_future, time_budget)
+
+    results = []
+    for position, (gcs_uri, _, _) in enumerate(images):
+        errors = {}
+        vision_results = None
+        if vision_error:
+            errors["vision"] = vision_error
+        elif isinstance(vision_batch[position], Exception):
+            errors["vision"] = str(vision_batch[position])
+        else:
+            vision_results = vision_batch[position]
+
+        vertex_text, vertex_error = collect_call_result(vertex_futures[position], time_budget)
+        if vertex_error:
+            errors["vertex"] = vertex_error
+
+        try:
+            results.append(combine_analysis(gcs_uri, vision_results, vertex_text, errors))
+        except RuntimeError as e:
+            results.append(e)
+
+    return results
+
+def build_vision_request(gcs_uri: str) -> Dict[str, Any]:
+    """
+        Builds the Vision annotate request (image source and features) for one image.
     """
     image = vision.Image()
     image.source.image_uri = gcs_uri
@@ -135,11 +351,43 @@ def analyze_with_vision(gcs_uri: str) -> Dict[str, Any]:
         vision.Feature(type_=vision.Feature.Type.LANDMARK_DETECTION)
     ]
     
-    response = vision_client.annotate_image({
+    return {
         'image': image,
         'features': features,
-    })
+    }
+
+def analyze_with_vision(gcs_uri: str, client=None, deadline: float | None = None) -> Dict[str, Any]:
+    """
+        Analyze image with Vision API. The RPC timeout is the time left until deadline (time.monotonic()), if given.
+    """
+    client = client or vision_client
+    response = client.annotate_image(build_vision_request(gcs_uri), **rpc_timeout_kwargs(deadline))
     
+    return format_vision_response(response)
+
+def analyze_with_vision_batch(gcs_uris: list[str], client=None, deadline: float | None = None) -> list[Dict[str, Any] | Exception]:
+    """
+        Analyze up to VISION_BATCH_LIMIT images with a single Vision batch_annotate_images request.
+        Returns each image's results in the same order, or a RuntimeError for images Vision could not annotate.
+    """
+    if len(gcs_uris) > VISION_BATCH_LIMIT:
+        raise ValueError(f"At most {VISION_BATCH_LIMIT} images can be annotated per Vision batch.")
+
+    client = client or vision_client
+    response = client.batch_annotate_images(requests=[build_vision_request(gcs_uri) for gcs_uri in gcs_uris], **rpc_timeout_kwargs(deadline))
+
+    results = []
+    for image_response in response.responses:
+        if image_response.error.message:
+            results.append(RuntimeError(f"Vision error: {image_response.error.message}"))
+        else:
+            results.append(format_vision_response(image_response))
+    return results
+
+def format_vision_response(response) -> Dict[str, Any]:
+    """
+        Extracts the objects, labels, landmarks and faces used by process_results from a Vision annotate response.
+    """
     result = {
         'objects': [{
             'name': obj.name,
@@ -169,11 +417,13 @@ def analyze_with_vision(gcs_uri: str) -> Dict[str, Any]:
     
     return result
 
-def analyze_with_vertex(gcs_uri: str, mime_type: str, description: str = "") -> str:
+def analyze_with_vertex(gcs_uri: str, mime_type: str, description: str = "", model=None, deadline: float | None = None) -> str:
     """
-        Analyze image with Vertex AI Gemini
+        Analyze image with Vertex AI Gemini. Not started if deadline (time.monotonic()) has passed. generate_content takes no per-request
+        timeout, so a call still running at the deadline is abandoned by the caller's wait() and recorded as timed out.
     """
-    model = GenerativeModel("gemini-2.0-flash-001")
+    remaining_time(deadline)
+    model = model or get_generative_model()
     
     prompt = f"""Analyze this image in detail and provide the following information:
 
@@ -216,10 +466,13 @@ def analyze_with_vertex(gcs_uri: str, mime_type: str, description: str = "") ->
     
     return response.text
 
-def process_results(vision_results: Dict[str, Any], vertex_text: str) -> Dict[str, Any]:
+def process_results(vision_results: Dict[str, Any] | None, vertex_text: str | None) -> Dict[str, Any]:
     """
-        Process and combine results from both APIs
+        Process and combine results from both APIs. Either side may be None when its call failed or timed out.
     """
+    vision_results = vision_results or {'objects': [], 'labels': [], 'landmarks': [], 'faces': []}
+    vertex_text = vertex_text or ""
+
     combined_results = {
         'entities': {
             'objects': vision_results['objects'],
@@ -228,7 +481,7 @@ def process_results(vision_results: Dict[str, Any], vertex_text: str) -> Dict[st
             'faces': vision_results['faces'],
             'total_faces': len(vision_results['faces'])
         },
-        'gemini_analysis': vertex_text, # TODO: Parse this text into a json, but for now just return the text
+        'gemini_analysis': vertex_text or None, # TODO: Parse this text into a json, but for now just return the text
         
         'quick_access': {
             'has_people': len(vision_results['faces']) > 0,
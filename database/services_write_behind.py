@@ -0,0 +1,125 @@
+import atexit
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Optional
+
+from firebase.initialize import firestore_db
+from config import app_config
+
+
+"""
+    Write-behind buffers for Firestore fields that do not need to be written before responding.
+"""
+FIRESTORE_BATCH_LIMIT = 500
+
+
+class LastLoginBuffer:
+    """
+        Queues last_login stamps per user and flushes them to users/{uid} in batched writes on a timer and at shutdown.
+        Repeated logins for the same user between flushes are coalesced into a single write of the latest stamp.
+    """
+    def __init__(self, flush_interval: float = 30.0):
+        self.flush_interval = flush_interval
+
+        self._pending: dict[str, datetime] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.queued = 0
+        self.written = 0
+
+    def record(self, user_id: str, timestamp: Optional[datetime] = None) -> None:
+        """
+            Queues a last_login stamp for the user, replacing any stamp not yet flushed.
+        """
+        timestamp = timestamp or datetime.now(timezone.utc)
+        with self._lock:
+            previous = self._pending.get(user_id)
+            if previous is None or timestamp > previous:
+                self._pending[user_id] = timestamp
+            self.queued += 1
+
+    def discard(self, user_id: str) -> None:
+        """
+            Drops any pending stamp for the user, e.g. when the account is being deleted.
+        """
+        with self._lock:
+            self._pending.pop(user_id, None)
+
+    def flush(self) -> int:
+        """
+            Writes all pending stamps in chunked batches, returns how many user documents were updated.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+
+            items = list(pending.items())
+            updated = 0
+            for start in range(0, len(items), FIRESTORE_BATCH_LIMIT):
+                updated += self._write_chunk(items[start:start + FIRESTORE_BATCH_LIMIT])
+
+            self.written += updated
+            return updated
+
+    def _write_chunk(self, items: list[tuple[str, datetime]]) -> int:
+        users_ref = firestore_db.collection("users")
+        batch = firestore_db.batch()
+        for user_id, timestamp in items:
+            batch.update(users_ref.document(user_id), {"last_login": timestamp})
+
+        try:
+            batch.commit()
+            return len(items)
+        except Exception as e:
+            # A batch fails as a whole if any document is missing (e.g. deleted account), so retry one by one.
+            logging.error(f"Error flushing last_login batch, retrying individually: {e}")
+
+        updated = 0
+        for user_id, timestamp in items:
+            try:
+                users_ref.document(user_id).update({"last_login": timestamp})
+                updated += 1
+            except Exception as e:
+                logging.error(f"Error updating last_login for {user_id}: {e}")
+        return updated
+
+    def start(self) -> None:
+        """
+            Starts the periodic flush thread and registers a final flush at interpreter shutdown.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="last-login-flush", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval)
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"Error flushing last_login stamps: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "queued": self.queued,
+                "written": self.written
+            }
+
+
+last_login_buffer = LastLoginBuffer(flush_interval=app_config.LAST_LOGIN_FLUSH_INTERVAL)
@@ -0,0 +1,142 @@
+import logging
+import re
+import threading
+import time
+from typing import Optional
+
+import requests
+
+from config import app_config
+
+
+"""
+    Google signing certificate manager for Firebase ID token verification.
+    Loads the public x509 certs at boot and refreshes them in the background before their Cache-Control max-age runs out,
+    so token verification never has to fetch keys on the request thread.
+"""
+MAX_AGE_PATTERN = re.compile(r"max-age=(\d+)")
+
+
+class SigningCertManager:
+    """
+        Keeps an up to date copy of the key id -> PEM certificate mapping served at certs_url.
+        certs_url can point at any server that returns the same JSON shape (e.g. a local stand-in when testing).
+    """
+    def __init__(self, certs_url: str, refresh_fraction: float = 0.8, min_refresh_interval: float = 60.0, retry_interval: float = 30.0, timeout: float = 10.0, session: Optional[requests.Session] = None):
+        self.certs_url = certs_url
+        self.refresh_fraction = refresh_fraction
+        self.min_refresh_interval = min_refresh_interval
+        self.retry_interval = retry_interval
+        self.timeout = timeout
+        self.session = session or requests.Session()
+
+        self._certs: dict[str, str] = {}
+        self._fetched_at: Optional[float] = None
+        self._max_age: float = 0.0
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._refresh_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+            Loads the certs synchronously (best effort) and starts the background refresh thread.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        try:
+            self.refresh()
+        except Exception as e:
+            logging.error(f"Error prefetching signing certificates: {e}")
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="signing-cert-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self._refresh_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.timeout)
+            self._thread = None
+
+    def refresh(self) -> None:
+        """
+            Fetches the certs from certs_url and swaps them in. Raises on failure, keeping the previous key set.
+        """
+        response = self.session.get(self.certs_url, timeout=self.timeout)
+        response.raise_for_status()
+
+        certs = response.json()
+        if not isinstance(certs, dict) or not certs:
+            raise ValueError("Signing certificate response is empty or malformed.")
+
+        match = MAX_AGE_PATTERN.search(response.headers.get("Cache-Control", ""))
+        max_age = float(match.group(1)) if match else 0.0
+
+        with self._lock:
+            self._certs = certs
+            self._fetched_at = time.monotonic()
+            self._max_age = max_age
+
+    def request_refresh(self) -> None:
+        """
+            Wakes the background thread to refresh now, e.g. when a token is signed with an unknown key id.
+            Ignored if the current key set is younger than min_refresh_interval so forged key ids cannot cause a fetch per request.
+        """
+        age = self.key_set_age()
+        if age is not None and age < self.min_refresh_interval:
+            return
+        self._refresh_event.set()
+
+    def get_certs(self) -> dict[str, str]:
+        """
+            Returns the current key id -> certificate mapping, or an empty dict if none has been loaded or it has expired.
+        """
+        with self._lock:
+            if self._fetched_at is None:
+                return {}
+            if self._max_age and time.monotonic() - self._fetched_at > self._max_age:
+                return {}
+            return self._certs
+
+    def key_set_age(self) -> Optional[float]:
+        """
+            Returns how many seconds ago the current key set was fetched, or None if no key set has been loaded.
+        """
+        with self._lock:
+            if self._fetched_at is None:
+                return None
+            return time.monotonic() - self._fetched_at
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "key_ids": sorted(self._certs.keys()),
+                "key_set_age": None if self._fetched_at is None else time.monotonic() - self._fetched_at,
+                "max_age": self._max_age
+            }
+
+    def _next_refresh_delay(self) -> float:
+        with self._lock:
+            if self._fetched_at is None:
+                return self.retry_interval
+            elapsed = time.monotonic() - self._fetched_at
+            return max(self._max_age * self.refresh_fraction - elapsed, self.min_refresh_interval)
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            self._refresh_event.wait(self._next_refresh_delay())
+            self._refresh_event.clear()
+            if self._stop_event.is_set():
+                break
+
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.error(f"Error refreshing signing certificates: {e}")
+                self._stop_event.wait(self.retry_interval)
+
+
+signing_cert_manager = SigningCertManager(app_config.FIREBASE_CERTS_URL)
@@ -1,23 +1,58 @@
+import hashlib
+import json
 import logging
+import time
 
 from firebase_admin import auth
+from google.auth import jwt
+
+from config import app_config
+from .cert_manager import signing_cert_manager
+from utils.cache import TTLCache
+
+
+"""
+    Verified ID token cache, keyed by a hash of the raw token so tokens are never held in memory as keys.
+    Entries live until the token's exp claim (or TOKEN_CACHE_REVOCATION_TTL when revocation checks are enabled).
+"""
+verified_token_cache = TTLCache(max_size=app_config.TOKEN_CACHE_MAX_SIZE)
+
+"""
+    Short-TTL positive/negative cache of email existence learned from sign in and sign up, keyed by lowercased email.
+"""
+email_exists_cache = TTLCache(max_size=app_config.EMAIL_EXISTS_CACHE_MAX_SIZE, default_ttl=app_config.EMAIL_EXISTS_CACHE_TTL)
 
 
 """
     Firebase Admin Helper Functions
 """
-def check_email_exists(email: str) -> bool:
+def peek_email_exists(email: str) -> bool | None:
     """
-        Given email, checks whether or not it exists in the Firebase system.
+        Returns the cached existence of an email without any upstream call, or None if it is not cached.
     """
-    try:
-        _ = auth.get_user_by_email(email)
-        return True
-    except auth.UserNotFoundError:
-        return False
-    except Exception as e:
-        logging.error(f"Unexpected error during login: {e}")
-        return False
+    return email_exists_cache.get(email.lower())
+
+def remember_email_exists(email: str, exists: bool) -> None:
+    """
+        Records the outcome of an upstream call that proves whether an email exists (sign in, sign up, etc.).
+    """
+    email_exists_cache.set(email.lower(), exists)
+
+def get_identity_toolkit_error_code(error: Exception) -> str | None:
+    """
+        Given an exception raised by Pyrebase, extracts the Identity Toolkit error code (e.g. EMAIL_NOT_FOUND).
+        Pyrebase raises requests.HTTPError(original_error, response_text), where the text is the JSON error body.
+    """
+    for arg in getattr(error, "args", ()):
+        if not isinstance(arg, str):
+            continue
+        try:
+            message = json.loads(arg).get("error", {}).get("message", "")
+        except (ValueError, AttributeError):
+            continue
+        # Some codes carry a description, e.g. "TOO_MANY_ATTEMPTS_TRY_LATER : Access to this account...".
+        return message.split(" : ")[0].strip() or None
+    return None
 
 # Currently unused, might be used in the future.
 def get_user_id_from_email(email: str) -> str:
@@ -31,14 +66,68 @@ def get_user_id_from_email(email: str) -> str:
         logging.error(f"Error retrieving user ID: {e}")
         return ""
 
+def _token_cache_key(firebase_token: str) -> str:
+    return hashlib.sha256(firebase_token.encode("utf-8")).hexdigest()
+
+def verify_token_locally(firebase_token: str) -> dict | None:
+    """
+        Verifies a Firebase ID token against the prefetched signing certs without any network calls.
+        Returns the decoded claims, or None if the signing key is not in the current key set (caller should fall back to the Admin SDK).
+        Raises ValueError if the token is invalid.
+    """
+    header = jwt.decode_header(firebase_token)
+    if header.get("alg") != "RS256":
+        raise ValueError("Token has an incorrect algorithm.")
+
+    certs = signing_cert_manager.get_certs()
+    key_id = header.get("kid")
+    if not certs or key_id not in certs:
+        signing_cert_manager.request_refresh()
+        return None
+
+    project_id = app_config.FIREBASE_PROJECT_ID
+    claims = jwt.decode(firebase_token, certs=certs, audience=project_id)
+
+    if claims.get("iss") != f"https://securetoken.google.com/{project_id}":
+        raise ValueError("Token has an incorrect issuer.")
+
+    subject = claims.get("sub")
+    if not isinstance(subject, str) or not subject or len(subject) > 128:
+        raise ValueError("Token has an invalid subject.")
+
+    claims["uid"] = subject
+    return claims
+
 def verify_user_token(firebase_token: str):
     """
         Given a firebase token, verifies if the token is valid.
+        Verified tokens are cached until they expire, so repeated requests with the same token skip signature verification.
     """
+    cache_key = _token_cache_key(firebase_token)
+    cached_uid = verified_token_cache.get(cache_key)
+    if cached_uid is not None:
+        return cached_uid
+
+    check_revoked = app_config.TOKEN_CACHE_CHECK_REVOKED
     try:
-        decoded_user = auth.verify_id_token(firebase_token)
+        decoded_user = None if check_revoked else verify_token_locally(firebase_token)
+        if decoded_user is None:
+            decoded_user = auth.verify_id_token(firebase_token, check_revoked=check_revoked)
         decoded_token = decoded_user.get("uid")
-        return decoded_token
     except Exception as e:
         logging.error(f"Error verifying user token: {e}")
-        return False
\ No newline at end of file
+        return False
+
+    ttl = decoded_user.get("exp", 0) - time.time()
+    if check_revoked:
+        ttl = min(ttl, app_config.TOKEN_CACHE_REVOCATION_TTL)
+    if decoded_token:
+        verified_token_cache.set(cache_key, decoded_token, ttl=ttl)
+
+    return decoded_token
+
+def invalidate_user_token(firebase_token: str) -> None:
+    """
+        Removes a token from the verified token cache, e.g. on logout or account deletion.
+    """
+    verified_token_cache.invalidate(_token_cache_key(firebase_token))
@@ -0,0 +1,296 @@
+import copy
+import sys
+import types
+import uuid
+
+import pytest
+from google.api_core.exceptions import NotFound
+from google.cloud import firestore
+from google.cloud.firestore_v1.transforms import ArrayUnion, Increment, Maximum, Minimum
+
+
+"""
+    In-memory stand-ins for the network edges (Firestore, Vision, Gemini).
+    firebase.initialize connects to the real services when imported, so a fake module exposing the same clients is installed
+    before any service module is imported. Everything else (the services, the SDK types) is the real code.
+"""
+def set_field(data: dict, field_path: list[str], value) -> None:
+    for key in field_path[:-1]:
+        data = data.setdefault(key, {})
+
+    old_value = data.get(field_path[-1])
+    if value is firestore.DELETE_FIELD:
+        data.pop(field_path[-1], None)
+    elif isinstance(value, Increment):
+        data[field_path[-1]] = (old_value or 0) + value.value
+    elif isinstance(value, Minimum):
+        data[field_path[-1]] = value.value if old_value is None else min(old_value, value.value)
+    elif isinstance(value, Maximum):
+        data[field_path[-1]] = value.value if old_value is None else max(old_value, value.value)
+    elif isinstance(value, ArrayUnion):
+        data[field_path[-1]] = (old_value or []) + [item for item in value.values if item not in (old_value or [])]
+    elif isinstance(value, dict):
+        # Maps are merged key by key, so transforms nested in a new map (e.g. {"days": {"01": {"count": Increment(1)}}}) still apply.
+        if not isinstance(old_value, dict):
+            old_value = data[field_path[-1]] = {}
+        for key, nested_value in value.items():
+            set_field(old_value, [key], nested_value)
+    else:
+        data[field_path[-1]] = copy.deepcopy(value)
+
+def get_field(data: dict | None, field: str):
+    for key in field.split("."):
+        if not isinstance(data, dict) or key not in data:
+            return None
+        data = data[key]
+    return data
+
+
+class FakeSnapshot:
+    def __init__(self, reference, data: dict | None):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> dict | None:
+        return copy.deepcopy(self._data)
+
+    def get(self, field: str):
+        return copy.deepcopy(get_field(self._data, field))
+
+
+class FakeQuery:
+    def __init__(self, db, matches_path):
+        self.db = db
+        self.matches_path = matches_path
+        self.filters = []
+        self.orders = []
+        self.max_results = None
+
+    def _copy(self):
+        query = FakeQuery(self.db, self.matches_path)
+        query.filters, query.orders, query.max_results = list(self.filters), list(self.orders), self.max_results
+        return query
+
+    def where(self, field: str, op: str, value):
+        query = self._copy()
+        query.filters.append((field, op, value))
+        return query
+
+    def select(self, fields):
+        return self._copy()
+
+    def order_by(self, field, direction: str = "ASCENDING"):
+        query = self._copy()
+        query.orders.append((field, direction))
+        return query
+
+    def limit(self, count: int):
+        query = self._copy()
+        query.max_results = count
+        return query
+
+    def stream(self):
+        operators = {
+            "==": lambda a, b: a == b,
+            "in": lambda a, b: a in b,
+            ">": lambda a, b: a is not None and a > b,
+            ">=": lambda a, b: a is not None and a >= b,
+            "<": lambda a, b: a is not None and a < b
+        }
+        snapshots = [
+            FakeSnapshot(FakeDocumentRef(self.db, path), copy.deepcopy(data))
+            for path, data in sorted(self.db.docs.items())
+            if self.matches_path(path)
+        ]
+        snapshots = [
+            snapshot for snapshot in snapshots
+            if all(operators[op](snapshot.get(field), value) for field, op, value in self.filters)
+        ]
+        for field, direction in reversed(self.orders):
+            snapshots.sort(key=lambda snapshot: snapshot.id if field == "__name__" else snapshot.get(field), reverse=direction == "DESCENDING")
+        return iter(snapshots[:self.max_results] if self.max_results is not None else snapshots)
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, db, path: str):
+        super().__init__(db, lambda doc_path: doc_path.rsplit("/", 1)[0] == path)
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def document(self, doc_id: str | None = None):
+        return FakeDocumentRef(self.db, f"{self.path}/{doc_id or uuid.uuid4().hex}")
+
+    def list_documents(self):
+        depth = self.path.count("/") + 2
+        doc_paths = {"/".join(path.split("/")[:depth]) for path in self.db.docs if path.startswith(f"{self.path}/")}
+        return [FakeDocumentRef(self.db, path) for path in sorted(doc_paths)]
+
+
+class FakeDocumentRef:
+    def __init__(self, db, path: str):
+        self.db = db
+        self.path = path
+        self.id = path.rsplit("/", 1)[-1]
+
+    def collection(self, name: str) -> FakeCollection:
+        return FakeCollection(self.db, f"{self.path}/{name}")
+
+    def get(self, transaction=None) -> FakeSnapshot:
+        return FakeSnapshot(self, copy.deepcopy(self.db.docs.get(self.path)))
+
+    def set(self, data: dict, merge: bool = False) -> None:
+        self.db.write(self.path, data, merge=merge)
+
+    def update(self, data: dict) -> None:
+        self.db.write(self.path, data, update=True)
+
+    def delete(self) -> None:
+        self.db.docs.pop(self.path, None)
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self.operations = []
+
+    def set(self, ref, data: dict, merge: bool = False) -> None:
+        self.operations.append(lambda: self.db.write(ref.path, data, merge=merge))
+
+    def update(self, ref, data: dict) -> None:
+        self.operations.append(lambda: self.db.write(ref.path, data, update=True))
+
+    def delete(self, ref) -> None:
+        self.operations.append(lambda: self.db.docs.pop(ref.path, None))
+
+    def commit(self) -> None:
+        if self.db.fail_commit is not None and self.db.fail_commit(self):
+            raise RuntimeError("Batch commit failed.")
+        self.db.committed_batch_sizes.append(len(self.operations))
+        for operation in self.operations:
+            operation()
+
+
+class FakeTransaction:
+    def __init__(self, db):
+        self.db = db
+
+    def set(self, ref, data: dict, merge: bool = False) -> None:
+        self.db.write(ref.path, data, merge=merge, transactional=True)
+
+    def update(self, ref, data: dict) -> None:
+        self.db.write(ref.path, data, update=True, transactional=True)
+
+
+class FakeFirestore:
+    """
+        Stands in for both firestore_db and gcp_firestore_db. fail_write(path, data) and fail_commit(batch) can return True to make a write fail.
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        self.docs: dict[str, dict] = {}
+        self.fail_write = None
+        self.fail_commit = None
+        self.committed_batch_sizes: list[int] = []
+
+    def write(self, path: str, data: dict, merge: bool = False, update: bool = False, transactional: bool = False) -> None:
+        if not transactional and self.fail_write is not None and self.fail_write(path, data):
+            raise RuntimeError(f"Write to {path} failed.")
+        if update and path not in self.docs:
+            raise NotFound(f"No document to update: {path}")
+
+        document = copy.deepcopy(self.docs.get(path, {})) if merge or update else {}
+        for key, value in data.items():
+            set_field(document, key.split(".") if update else [key], value)
+        self.docs[path] = document
+
+    def collection(self, name: str) -> FakeCollection:
+        return FakeCollection(self, name)
+
+    def document(self, path: str) -> FakeDocumentRef:
+        return FakeDocumentRef(self, path)
+
+    def collection_group(self, name: str) -> FakeQuery:
+        return FakeQuery(self, lambda path: path.split("/")[-2] == name)
+
+    def get_all(self, refs, transaction=None):
+        return [ref.get() for ref in refs]
+
+    def batch(self) -> FakeBatch:
+        return FakeBatch(self)
+
+    def transaction(self) -> FakeTransaction:
+        return FakeTransaction(self)
+
+
+class FakeVisionClient:
+    """
+        Returns the given labels for every image. Images whose URI ends with a path in fail_paths fail (the single call raises,
+        the batch call returns a per-image error).
+    """
+    def __init__(self, labels: list[str] | None = None, fail_paths: tuple = ()):
+        self.labels = labels or []
+        self.fail_paths = fail_paths
+        self.calls = 0
+
+    def _response(self, request):
+        uri = request["image"].source.image_uri
+        failed = uri.endswith(self.fail_paths) if self.fail_paths else False
+        return types.SimpleNamespace(
+            localized_object_annotations=[],
+            label_annotations=[types.SimpleNamespace(description=label, score=0.9) for label in self.labels],
+            landmark_annotations=[],
+            face_annotations=[],
+            error=types.SimpleNamespace(message="Image could not be read." if failed else "")
+        ), failed
+
+    def annotate_image(self, request, timeout=None):
+        self.calls += 1
+        response, failed = self._response(request)
+        if failed:
+            raise RuntimeError("Vision failed.")
+        return response
+
+    def batch_annotate_images(self, requests, timeout=None):
+        self.calls += 1
+        return types.SimpleNamespace(responses=[self._response(request)[0] for request in requests])
+
+
+class FakeModel:
+    """
+        Returns text for every image, or raises if fail is set (or the image's URI ends with a path in fail_paths).
+    """
+    def __init__(self, text: str = "", fail: bool = False, fail_paths: tuple = ()):
+        self.text = text
+        self.fail = fail
+        self.fail_paths = fail_paths
+        self.calls = 0
+
+    def generate_content(self, contents):
+        self.calls += 1
+        uri = contents[0].file_data.file_uri
+        if self.fail or (self.fail_paths and uri.endswith(self.fail_paths)):
+            raise RuntimeError("Gemini failed.")
+        return types.SimpleNamespace(text=self.text)
+
+
+fake_firestore = FakeFirestore()
+sys.modules["firebase.initialize"] = types.SimpleNamespace(
+    firestore_db=fake_firestore,
+    gcp_firestore_db=fake_firestore,
+    bucket=None,
+    vision_client=None,
+    pyre_auth=None,
+    pyre_cloud_storage=None
+)
+
+
+@pytest.fixture(autouse=True)
+def firestore_fake(monkeypatch):
+    fake_firestore.reset()
+    # Transactions run their function once against the fake, which applies writes immediately.
+    monkeypatch.setattr(firestore, "transactional", lambda transaction_function: transaction_function)
+    return fake_firestore
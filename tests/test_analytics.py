@@ -0,0 +1,110 @@
+import collections
+import datetime
+import random
+
+import numpy as np
+import pytest
+
+from utils.analytics import analyze_exercise_attempts, analyze_exercise_rollups, min_max_normalize
+
+
+"""
+    Per-day averages from the implementation before user-017 (utils/normalizors.py), used as the reference.
+"""
+def original_process_exercise_data(attempts):
+    grouped_data = collections.defaultdict(list)
+    for attempt in attempts:
+        grouped_data[attempt["timestamp"].date()].append(attempt)
+
+    result = {}
+    for day in sorted(grouped_data):
+        daily_attempts = grouped_data[day]
+        accuracies = [attempt["accuracy"] for attempt in daily_attempts if "accuracy" in attempt]
+        reaction_time = [attempt["avg_reaction_time"] for attempt in daily_attempts if "avg_reaction_time" in attempt]
+        result[day] = [
+            sum(accuracies) / len(accuracies) if accuracies else 0,
+            sum(reaction_time) / len(reaction_time) if reaction_time else 0
+        ]
+    return result
+
+def original_process_exercise_rollups(rollups):
+    totals = collections.defaultdict(lambda: [0, 0.0, 0.0])
+    for rollup in rollups:
+        day_totals = totals[rollup["date"].date()]
+        day_totals[0] += rollup.get("count", 0)
+        day_totals[1] += rollup.get("accuracy_sum", 0.0)
+        day_totals[2] += rollup.get("reaction_time_sum", 0.0)
+
+    result = {}
+    for day in sorted(totals):
+        count, accuracy_sum, reaction_time_sum = totals[day]
+        result[day] = [accuracy_sum / count if count else 0, reaction_time_sum / count if count else 0]
+    return result
+
+
+def synthetic_attempts(count: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+    attempts = []
+    for _ in range(count):
+        attempt = {
+            "exercise_name": f"exercise-{rng.randrange(4)}",
+            "timestamp": start + datetime.timedelta(seconds=rng.randrange(60 * 86400)),
+            "accuracy": rng.random(),
+            "avg_reaction_time": rng.uniform(200, 900)
+        }
+        # Raw attempts may miss either measurement.
+        if rng.random() < 0.05:
+            del attempt["accuracy"]
+        if rng.random() < 0.05:
+            del attempt["avg_reaction_time"]
+        attempts.append(attempt)
+    return attempts
+
+def daily_averages(analysis: dict) -> dict:
+    daily = analysis["daily"]
+    return {
+        date.item(): [float(accuracy), float(reaction_time)]
+        for date, accuracy, reaction_time in zip(daily["dates"], daily["avg_accuracy"], daily["avg_reaction_time"])
+    }
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_daily_averages_match_previous_implementation(seed):
+    attempts = synthetic_attempts(5000, seed)
+
+    assert daily_averages(analyze_exercise_attempts(attempts)) == original_process_exercise_data(attempts)
+
+def test_days_with_only_missing_measurements_average_to_zero():
+    day = datetime.datetime(2024, 5, 1, 12, tzinfo=datetime.timezone.utc)
+    attempts = [
+        {"exercise_name": "memory", "timestamp": day, "avg_reaction_time": 400.0},
+        {"exercise_name": "memory", "timestamp": day + datetime.timedelta(days=1), "accuracy": 0.5}
+    ]
+
+    assert daily_averages(analyze_exercise_attempts(attempts)) == original_process_exercise_data(attempts)
+
+def test_rollup_daily_averages_match_previous_implementation():
+    attempts = [attempt for attempt in synthetic_attempts(3000, 3) if "accuracy" in attempt and "avg_reaction_time" in attempt]
+    rollups = {}
+    for attempt in attempts:
+        day = attempt["timestamp"].replace(hour=0, minute=0, second=0, microsecond=0)
+        rollup = rollups.setdefault((attempt["exercise_name"], day), {
+            "exercise_name": attempt["exercise_name"], "date": day, "count": 0, "accuracy_sum": 0.0, "reaction_time_sum": 0.0
+        })
+        rollup["count"] += 1
+        rollup["accuracy_sum"] += attempt["accuracy"]
+        rollup["reaction_time_sum"] += attempt["avg_reaction_time"]
+    rollups = list(rollups.values())
+
+    assert daily_averages(analyze_exercise_rollups(rollups)) == original_process_exercise_rollups(rollups)
+
+def test_min_max_normalize_matches_previous_normalizer():
+    values = np.array([300.0, 450.0, 600.0])
+
+    assert min_max_normalize(values).tolist() == [0.0, 0.5, 1.0]
+    assert min_max_normalize(values, invert=True).tolist() == [1.0, 0.5, 0.0]
+    assert min_max_normalize(np.array([2.0, 2.0])).tolist() == [0.5, 0.5]
+
+def test_no_attempts_gives_no_analysis():
+    assert analyze_exercise_attempts([]) == {}
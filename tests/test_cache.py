@@ -0,0 +1,80 @@
+import types
+
+import pytest
+
+from utils import cache as cache_module
+from utils.cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(cache_module, "time", types.SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+def test_get_returns_value_until_it_expires(clock):
+    cache = TTLCache(max_size=10, default_ttl=30)
+    cache.set("key", "value")
+
+    clock.now += 29
+    assert cache.get("key") == "value"
+
+    clock.now += 1
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+def test_per_entry_ttl_overrides_the_default(clock):
+    cache = TTLCache(max_size=10, default_ttl=30)
+    cache.set("short", 1, ttl=5)
+    cache.set("long", 2)
+
+    clock.now += 10
+    assert cache.get("short", "missing") == "missing"
+    assert cache.get("long") == 2
+
+def test_non_positive_ttl_is_not_cached(clock):
+    cache = TTLCache(max_size=10)
+    cache.set("key", "value", ttl=0)
+
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TTLCache(max_size=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_invalidate_and_invalidate_where(clock):
+    cache = TTLCache(max_size=10)
+    cache.set(("main", "support-1"), True)
+    cache.set(("main", "support-2"), True)
+    cache.set(("other", "support-1"), True)
+
+    cache.invalidate(("other", "support-1"))
+    assert cache.invalidate_where(lambda key: "main" in key) == 2
+    assert len(cache) == 0
+
+def test_stats_count_hits_misses_and_expired_reads(clock):
+    cache = TTLCache(max_size=10, default_ttl=10)
+    cache.set("key", "value")
+
+    cache.get("key")
+    cache.get("missing")
+    clock.now += 10
+    cache.get("key")
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 2, 0)
+    assert stats["hit_rate"] == pytest.approx(1 / 3)
+
+def test_max_size_must_be_positive():
+    with pytest.raises(ValueError):
+        TTLCache(max_size=0)
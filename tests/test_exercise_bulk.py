@@ -0,0 +1,85 @@
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+
+from database.services_firestore import FIRESTORE_BATCH_LIMIT, store_exercise_data_bulk
+
+
+def make_attempts(exercises: int, days: int, per_day: int) -> list[dict]:
+    start = datetime(2025, 3, 1, 9, tzinfo=timezone.utc)
+    return [
+        {
+            "exercise_name": f"exercise-{exercise}",
+            "timestamp": start + timedelta(days=day, minutes=attempt),
+            "accuracy": (exercise + day + attempt) % 10 / 10,
+            "avg_reaction_time": 300.0 + attempt
+        }
+        for exercise in range(exercises)
+        for day in range(days)
+        for attempt in range(per_day)
+    ]
+
+def stored_rollups(firestore_fake) -> dict:
+    return {
+        path.rsplit("/", 1)[-1]: data
+        for path, data in firestore_fake.docs.items()
+        if path.startswith("exercise_rollups/user-1/days/")
+    }
+
+
+def test_batches_stay_within_the_write_limit(firestore_fake):
+    # Many small (exercise, day) groups, so rollup writes make up a large share of each batch.
+    attempts = make_attempts(exercises=4, days=150, per_day=2)
+
+    results = store_exercise_data_bulk(attempts, "user-1")
+
+    assert all(result["status"] == "created" for result in results)
+    assert len(firestore_fake.committed_batch_sizes) > 1
+    assert max(firestore_fake.committed_batch_sizes) <= FIRESTORE_BATCH_LIMIT
+    # A group split across two batches writes its rollup once in each, so at most one extra rollup write per batch boundary.
+    batch_boundaries = len(firestore_fake.committed_batch_sizes) - 1
+    assert len(attempts) + len(stored_rollups(firestore_fake)) <= sum(firestore_fake.committed_batch_sizes) <= len(attempts) + len(stored_rollups(firestore_fake)) + batch_boundaries
+
+def test_rollups_fold_in_every_attempt_once(firestore_fake):
+    attempts = make_attempts(exercises=2, days=3, per_day=400)
+
+    store_exercise_data_bulk(attempts, "user-1")
+
+    expected = defaultdict(list)
+    for attempt in attempts:
+        expected[f"{attempt['exercise_name']}_{attempt['timestamp']:%Y-%m-%d}"].append(attempt)
+
+    rollups = stored_rollups(firestore_fake)
+    assert set(rollups) == set(expected)
+    for rollup_id, group in expected.items():
+        accuracies = [attempt["accuracy"] for attempt in group]
+        assert rollups[rollup_id]["count"] == len(group)
+        assert rollups[rollup_id]["accuracy_sum"] == sum(accuracies)
+        assert rollups[rollup_id]["accuracy_min"] == min(accuracies)
+        assert rollups[rollup_id]["accuracy_max"] == max(accuracies)
+
+def test_results_follow_input_order_and_ids_match_stored_attempts(firestore_fake):
+    attempts = make_attempts(exercises=3, days=2, per_day=3)[::-1]
+
+    results = store_exercise_data_bulk(attempts, "user-1")
+
+    for attempt, result in zip(attempts, results):
+        doc = firestore_fake.docs[f"exercises/{attempt['exercise_name']}/user_attempts/user-1/attempts/{result['id']}"]
+        assert doc["timestamp"] == attempt["timestamp"]
+        assert doc["accuracy"] == attempt["accuracy"]
+
+def test_failed_batch_only_fails_its_own_attempts(firestore_fake):
+    attempts = make_attempts(exercises=2, days=1, per_day=450)
+    commits = []
+    def fail_second_commit(batch):
+        commits.append(batch)
+        return len(commits) == 2
+    firestore_fake.fail_commit = fail_second_commit
+
+    results = store_exercise_data_bulk(attempts, "user-1")
+
+    statuses = [result["status"] for result in results]
+    assert "failed" in statuses and "created" in statuses
+    created = sum(status == "created" for status in statuses)
+    stored = sum(1 for path in firestore_fake.docs if "/attempts/" in path)
+    assert stored == created
+    assert sum(rollup["count"] for rollup in stored_rollups(firestore_fake).values()) == created
@@ -0,0 +1,173 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from database.services_analysis import ImageAnalysisQueue, STALE_RUNNING_AFTER, pending_analysis
+from conftest import FakeModel, FakeVisionClient
+
+
+UPLOAD_PATH = "uploads/main-user/user_uploads/upload-1"
+
+
+def add_upload(firestore_fake, upload_path: str = UPLOAD_PATH, **analysis) -> None:
+    firestore_fake.document(upload_path).set({
+        "destination_path": f"main-user/{upload_path.rsplit('/', 1)[-1]}.jpg",
+        "mime_type": "image/jpeg",
+        "description": "At the beach",
+        "file_type": "image",
+        "analysis": {**pending_analysis(), **analysis}
+    })
+
+def get_analysis(firestore_fake, upload_path: str = UPLOAD_PATH) -> dict:
+    return firestore_fake.document(upload_path).get().to_dict()["analysis"]
+
+def make_queue(client=None, model=None, max_retries: int = 0) -> ImageAnalysisQueue:
+    return ImageAnalysisQueue(
+        max_workers=1,
+        max_retries=max_retries,
+        base_delay=0.0,
+        client=client or FakeVisionClient(labels=["Beach", "Sky"]),
+        model=model or FakeModel(text="Two people walking outdoor on a beach")
+    )
+
+
+def test_process_completes_pending_upload(firestore_fake):
+    add_upload(firestore_fake)
+
+    make_queue().process(UPLOAD_PATH)
+
+    analysis = get_analysis(firestore_fake)
+    assert analysis["status"] == "completed"
+    assert analysis["attempts"] == 1
+    assert analysis["analysis"]["quick_access"]["top_labels"] == ["Beach", "Sky"]
+    assert "outdoor" in analysis["analysis"]["quick_access"]["probable_scenes"]
+    assert "partial" not in analysis["analysis"]
+
+def test_process_keeps_partial_results_when_one_side_fails(firestore_fake):
+    add_upload(firestore_fake)
+
+    make_queue(model=FakeModel(fail=True)).process(UPLOAD_PATH)
+
+    analysis = get_analysis(firestore_fake)
+    assert analysis["status"] == "completed"
+    assert analysis["analysis"]["partial"] is True
+    assert set(analysis["analysis"]["errors"]) == {"vertex"}
+    assert analysis["analysis"]["quick_access"]["top_labels"] == ["Beach", "Sky"]
+
+def test_process_skips_upload_running_under_another_claim(firestore_fake):
+    add_upload(firestore_fake, status="running", started_at=datetime.now(timezone.utc), claim_token="other-job", attempts=1)
+    client = FakeVisionClient()
+
+    result = make_queue(client=client).process(UPLOAD_PATH)
+
+    assert result == {"status": "running"}
+    assert client.calls == 0
+    assert get_analysis(firestore_fake)["claim_token"] == "other-job"
+
+def test_process_skips_completed_upload(firestore_fake):
+    add_upload(firestore_fake, status="completed", attempts=1)
+    client = FakeVisionClient()
+
+    assert make_queue(client=client).process(UPLOAD_PATH) == {"status": "completed"}
+    assert client.calls == 0
+
+def test_stale_running_upload_is_claimed_again(firestore_fake):
+    started_at = datetime.now(timezone.utc) - STALE_RUNNING_AFTER - timedelta(seconds=1)
+    add_upload(firestore_fake, status="running", started_at=started_at, claim_token="abandoned-job", attempts=1)
+
+    make_queue().process(UPLOAD_PATH)
+
+    analysis = get_analysis(firestore_fake)
+    assert analysis["status"] == "completed"
+    assert analysis["attempts"] == 2
+
+def test_failing_job_is_retried_then_marked_failed(firestore_fake):
+    add_upload(firestore_fake)
+    queue = make_queue(client=FakeVisionClient(fail_paths=("upload-1.jpg",)), model=FakeModel(fail=True), max_retries=1)
+
+    with pytest.raises(RuntimeError):
+        queue.enqueue(UPLOAD_PATH).result(timeout=10)
+
+    analysis = get_analysis(firestore_fake)
+    assert analysis["status"] == "failed"
+    assert analysis["attempts"] == 2
+    assert "Image analysis failed" in analysis["error"]
+    assert queue.stats() == {"submitted": 1, "succeeded": 0, "failed": 1, "retried": 1}
+
+def test_failure_after_claim_sets_upload_to_retrying(firestore_fake):
+    add_upload(firestore_fake)
+    # The analysis succeeds but storing the completed result fails.
+    firestore_fake.fail_write = lambda path, data: "analysis" in data
+
+    with pytest.raises(RuntimeError):
+        make_queue().process(UPLOAD_PATH)
+
+    analysis = get_analysis(firestore_fake)
+    assert analysis["status"] == "retrying"
+    assert "failed" in analysis["error"]
+
+def test_retry_reclaims_upload_left_running_by_its_own_failed_attempt(firestore_fake):
+    add_upload(firestore_fake)
+    # The first attempt can neither store its result nor release its claim, so the upload is left running.
+    failed_writes = []
+    def fail_first_attempt(path, data):
+        if len(failed_writes) < 2:
+            failed_writes.append(data)
+            return True
+        return False
+    firestore_fake.fail_write = fail_first_attempt
+
+    queue = make_queue(max_retries=1)
+    queue.enqueue(UPLOAD_PATH).result(timeout=10)
+
+    analysis = get_analysis(firestore_fake)
+    assert len(failed_writes) == 2
+    assert analysis["status"] == "completed"
+    assert analysis["attempts"] == 2
+    assert queue.stats()["retried"] == 1
+
+def test_process_batch_stores_each_image_status(firestore_fake):
+    upload_paths = [f"uploads/main-user/user_uploads/upload-{i}" for i in range(3)]
+    for upload_path in upload_paths:
+        add_upload(firestore_fake, upload_path)
+
+    queue = make_queue(client=FakeVisionClient(labels=["Dog"], fail_paths=("upload-1.jpg",)), model=FakeModel(text="walking", fail_paths=("upload-1.jpg",)))
+    statuses = queue.process_batch(upload_paths, failure_status="retrying")
+
+    assert statuses == {upload_paths[0]: "completed", upload_paths[1]: "retrying", upload_paths[2]: "completed"}
+    assert queue.client.calls == 1
+    assert get_analysis(firestore_fake, upload_paths[0])["analysis"]["quick_access"]["top_labels"] == ["Dog"]
+    assert get_analysis(firestore_fake, upload_paths[1])["status"] == "retrying"
+
+def test_process_batch_releases_claims_when_commit_fails(firestore_fake):
+    upload_paths = [f"uploads/main-user/user_uploads/upload-{i}" for i in range(2)]
+    for upload_path in upload_paths:
+        add_upload(firestore_fake, upload_path)
+    # Only the batch with the results fails; the one releasing the claims goes through.
+    commits = []
+    def fail_first_commit(batch):
+        commits.append(batch)
+        return len(commits) == 1
+    firestore_fake.fail_commit = fail_first_commit
+
+    with pytest.raises(RuntimeError):
+        make_queue().process_batch(upload_paths)
+
+    assert len(commits) == 2
+    assert [get_analysis(firestore_fake, upload_path)["status"] for upload_path in upload_paths] == ["retrying", "retrying"]
+
+def test_resume_pending_queues_only_claimable_uploads(firestore_fake, monkeypatch):
+    now = datetime.now(timezone.utc)
+    add_upload(firestore_fake, "uploads/main-user/user_uploads/pending")
+    add_upload(firestore_fake, "uploads/main-user/user_uploads/retrying", status="retrying")
+    add_upload(firestore_fake, "uploads/main-user/user_uploads/running", status="running", started_at=now)
+    add_upload(firestore_fake, "uploads/main-user/user_uploads/stale", status="running", started_at=now - STALE_RUNNING_AFTER - timedelta(seconds=1))
+    add_upload(firestore_fake, "uploads/main-user/user_uploads/completed", status="completed")
+    add_upload(firestore_fake, "uploads/main-user/user_uploads/failed", status="failed")
+
+    queue = make_queue()
+    queued = []
+    monkeypatch.setattr(queue, "enqueue_many", queued.extend)
+
+    assert queue.resume_pending() == 3
+    assert sorted(path.rsplit("/", 1)[-1] for path in queued) == ["pending", "retrying", "stale"]
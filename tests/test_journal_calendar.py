@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta, timezone
+
+from database.services_firestore import backfill_journal_calendars, get_journal_calendar, store_journal_entries
+
+
+NEW_YORK = timezone(timedelta(hours=-5))
+
+
+def calendar_docs(firestore_fake) -> dict:
+    return {path: data for path, data in firestore_fake.docs.items() if "/calendar/" in path}
+
+
+def test_live_writes_bucket_entries_by_utc_day(firestore_fake):
+    # 22:00 on March 31st in New York is 03:00 on April 1st UTC.
+    store_journal_entries("late", datetime(2025, 3, 31, 22, tzinfo=NEW_YORK), "journals/late.txt", "user-1")
+
+    assert get_journal_calendar("user-1", "2025-03") == []
+    assert [(day["date"], day["count"]) for day in get_journal_calendar("user-1", "2025-04")] == [("2025-04-01", 1)]
+
+def test_backfill_rebuilds_the_same_calendars_as_live_writes(firestore_fake):
+    timestamps = [
+        datetime(2025, 3, 31, 22, tzinfo=NEW_YORK),
+        datetime(2025, 3, 31, 18, tzinfo=NEW_YORK),
+        datetime(2025, 4, 1, 1, tzinfo=timezone.utc),
+        datetime(2025, 4, 15, 12, tzinfo=timezone(timedelta(hours=9)))
+    ]
+    for index, timestamp in enumerate(timestamps):
+        store_journal_entries(f"entry {index}", timestamp, f"journals/{index}.txt", "user-1")
+    live = calendar_docs(firestore_fake)
+
+    for path in live:
+        del firestore_fake.docs[path]
+    written = backfill_journal_calendars()
+
+    assert written == len(live) == 2
+    assert calendar_docs(firestore_fake) == live
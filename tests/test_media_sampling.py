@@ -0,0 +1,38 @@
+import random
+from collections import Counter
+
+from database.services_firestore import sample_unvisited_indices
+
+
+def test_samples_distinct_unvisited_indices_in_range():
+    random.seed(7)
+    visited = [0, 3, 5, 9]
+
+    for _ in range(200):
+        indices = sample_unvisited_indices(10, visited, 4)
+        assert len(indices) == 4
+        assert len(set(indices)) == 4
+        assert all(0 <= index < 10 and index not in visited for index in indices)
+
+def test_count_is_capped_at_the_unvisited_indices():
+    indices = sample_unvisited_indices(6, [1, 4], 10)
+
+    assert sorted(indices) == [0, 2, 3, 5]
+
+def test_visited_indices_out_of_range_or_repeated_are_ignored():
+    indices = sample_unvisited_indices(3, [1, 1, -1, 3, 40], 5)
+
+    assert sorted(indices) == [0, 2]
+
+def test_returns_nothing_when_everything_was_visited():
+    assert sample_unvisited_indices(3, [0, 1, 2], 2) == []
+    assert sample_unvisited_indices(0, [], 2) == []
+
+def test_every_unvisited_index_is_equally_likely():
+    random.seed(11)
+    visited = [2, 4]
+    counts = Counter(index for _ in range(6000) for index in sample_unvisited_indices(8, visited, 2))
+
+    assert set(counts) == {0, 1, 3, 5, 6, 7}
+    # 12000 draws over 6 indices: 2000 each on average.
+    assert all(1750 < count < 2250 for count in counts.values())
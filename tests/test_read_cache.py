@@ -0,0 +1,74 @@
+import flask
+import pytest
+
+from database.services_firestore import get_document, get_documents, get_request_read_stats, forget_document
+
+
+@pytest.fixture
+def request_context():
+    app = flask.Flask(__name__)
+    with app.app_context():
+        yield
+
+
+def test_get_document_reads_each_document_once_per_request(firestore_fake, request_context):
+    user_ref = firestore_fake.document("users/user-1")
+    user_ref.set({"first_name": "Ada"})
+
+    assert get_document(user_ref).get("first_name") == "Ada"
+    user_ref.set({"first_name": "Changed"})
+    assert get_document(user_ref).get("first_name") == "Ada"
+
+    assert get_request_read_stats() == {"hits": 1, "misses": 1}
+
+def test_get_documents_fetches_only_uncached_documents(firestore_fake, request_context):
+    refs = [firestore_fake.document(f"users/user-{i}") for i in range(3)]
+    for i, ref in enumerate(refs):
+        ref.set({"index": i})
+
+    get_document(refs[0])
+    snapshots = get_documents(refs)
+
+    assert [snapshot.get("index") for snapshot in snapshots] == [0, 1, 2]
+    assert get_request_read_stats() == {"hits": 1, "misses": 3}
+
+def test_missing_documents_are_cached_too(firestore_fake, request_context):
+    ref = firestore_fake.document("users/missing")
+
+    assert not get_document(ref).exists
+    assert not get_document(ref).exists
+    assert get_request_read_stats() == {"hits": 1, "misses": 1}
+
+def test_forget_document_forces_a_fresh_read(firestore_fake, request_context):
+    ref = firestore_fake.document("users/user-1")
+    ref.set({"first_name": "Ada"})
+
+    get_document(ref)
+    ref.set({"first_name": "Grace"})
+    forget_document(ref)
+
+    assert get_document(ref).get("first_name") == "Grace"
+    assert get_request_read_stats() == {"hits": 0, "misses": 2}
+
+def test_reads_go_straight_to_firestore_outside_a_request(firestore_fake):
+    ref = firestore_fake.document("users/user-1")
+    ref.set({"first_name": "Ada"})
+    get_document(ref)
+    ref.set({"first_name": "Grace"})
+
+    assert get_document(ref).get("first_name") == "Grace"
+    assert [snapshot.get("first_name") for snapshot in get_documents([ref])] == ["Grace"]
+    assert get_request_read_stats() == {"hits": 0, "misses": 0}
+
+def test_each_request_starts_with_an_empty_cache(firestore_fake):
+    app = flask.Flask(__name__)
+    ref = firestore_fake.document("users/user-1")
+    ref.set({"first_name": "Ada"})
+
+    with app.app_context():
+        get_document(ref)
+    ref.set({"first_name": "Grace"})
+
+    with app.app_context():
+        assert get_document(ref).get("first_name") == "Grace"
+        assert get_request_read_stats() == {"hits": 0, "misses": 1}
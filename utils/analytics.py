@@ -0,0 +1,233 @@
+import datetime
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+"""
+    Vectorized exercise analytics. Attempts or daily rollups are loaded into columnar NumPy arrays once,
+    then grouped with np.unique/np.bincount instead of per-attempt Python dicts and loops.
+"""
+@dataclass
+class ExerciseColumns:
+    """
+        Columnar view of exercise data. Each row is either one attempt or one per-exercise daily rollup.
+        Accuracy and reaction time keep separate counts because a raw attempt may be missing either field.
+    """
+    days: np.ndarray                    # datetime64[D], UTC day of the row
+    exercise_ids: np.ndarray            # int index into exercise_names
+    exercise_names: List[str]
+    accuracy_counts: np.ndarray
+    accuracy_sums: np.ndarray
+    reaction_time_counts: np.ndarray
+    reaction_time_sums: np.ndarray
+
+    @classmethod
+    def from_attempts(cls, attempts: List[Dict[str, Any]]) -> "ExerciseColumns":
+        """
+            Loads raw attempts (timestamp, exercise_name, accuracy, avg_reaction_time).
+        """
+        accuracies = np.array([attempt.get("accuracy", np.nan) for attempt in attempts], dtype=np.float64)
+        reaction_times = np.array([attempt.get("avg_reaction_time", np.nan) for attempt in attempts], dtype=np.float64)
+        has_accuracy = ~np.isnan(accuracies)
+        has_reaction_time = ~np.isnan(reaction_times)
+
+        exercise_ids, exercise_names = factorize([attempt.get("exercise_name", "") for attempt in attempts])
+
+        return cls(
+            days=to_utc_days([attempt["timestamp"] for attempt in attempts]),
+            exercise_ids=exercise_ids,
+            exercise_names=exercise_names,
+            accuracy_counts=has_accuracy.astype(np.float64),
+            accuracy_sums=np.where(has_accuracy, accuracies, 0.0),
+            reaction_time_counts=has_reaction_time.astype(np.float64),
+            reaction_time_sums=np.where(has_reaction_time, reaction_times, 0.0)
+        )
+
+    @classmethod
+    def from_rollups(cls, rollups: List[Dict[str, Any]]) -> "ExerciseColumns":
+        """
+            Loads daily rollup documents (date, exercise_name, count, accuracy_sum, reaction_time_sum).
+        """
+        counts = np.array([rollup.get("count", 0) for rollup in rollups], dtype=np.float64)
+        exercise_ids, exercise_names = factorize([rollup.get("exercise_name", "") for rollup in rollups])
+
+        return cls(
+            days=to_utc_days([rollup["date"] for rollup in rollups]),
+            exercise_ids=exercise_ids,
+            exercise_names=exercise_names,
+            accuracy_counts=counts,
+            accuracy_sums=np.array([rollup.get("accuracy_sum", 0.0) for rollup in rollups], dtype=np.float64),
+            reaction_time_counts=counts,
+            reaction_time_sums=np.array([rollup.get("reaction_time_sum", 0.0) for rollup in rollups], dtype=np.float64)
+        )
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+
+SECONDS_PER_DAY = 86400
+GRANULARITIES = ("day", "week", "month")
+DEFAULT_ROLLING_WINDOWS = {"day": 7, "week": 4, "month": 3}
+
+def to_utc_days(timestamps: List[datetime.datetime]) -> np.ndarray:
+    """
+        Converts timestamps to UTC calendar days (datetime64[D]). Naive timestamps are treated as UTC.
+    """
+    epoch_seconds = np.array([
+        timestamp.timestamp() if timestamp.tzinfo is not None else timestamp.replace(tzinfo=datetime.timezone.utc).timestamp()
+        for timestamp in timestamps
+    ], dtype=np.float64)
+    return np.floor_divide(epoch_seconds, SECONDS_PER_DAY).astype("datetime64[D]")
+
+def factorize(names: List[str]) -> tuple[np.ndarray, List[str]]:
+    """
+        Maps each name to an integer code in order of first appearance, returns the codes and the distinct names.
+    """
+    codes: Dict[str, int] = {}
+    ids = np.fromiter((codes.setdefault(name, len(codes)) for name in names), dtype=np.int64, count=len(names))
+    return ids, list(codes)
+
+def bucket_days(days: np.ndarray, granularity: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+        Maps UTC days to the start day of their period (weeks start on Monday) and to an integer ordinal per period.
+    """
+    if granularity == "day":
+        return days, days.astype(np.int64)
+    if granularity == "week":
+        day_numbers = days.astype(np.int64)
+        # 1970-01-01 was a Thursday, so (day_number + 3) % 7 is 0 on Mondays.
+        week_starts = day_numbers - (day_numbers + 3) % 7
+        return week_starts.astype("datetime64[D]"), week_starts // 7
+    if granularity == "month":
+        months = days.astype("datetime64[M]")
+        return months.astype("datetime64[D]"), months.astype(np.int64)
+    raise ValueError(f"Invalid granularity, expected one of: {', '.join(GRANULARITIES)}.")
+
+def safe_divide(numerators: np.ndarray, denominators: np.ndarray) -> np.ndarray:
+    """
+        Element-wise division that yields 0 where the denominator is 0 (matching the previous per-day averages).
+    """
+    return np.divide(numerators, denominators, out=np.zeros_like(numerators, dtype=np.float64), where=denominators > 0)
+
+def min_max_normalize(values: np.ndarray, invert: bool = False) -> np.ndarray:
+    """
+        Normalizes values to 0..1 with min-max normalization (inverted if invert is True). A constant series maps to 0.5.
+    """
+    if values.size == 0:
+        return values.astype(np.float64)
+
+    value_range = values.max() - values.min()
+    if value_range == 0:
+        return np.full(values.shape, 0.5)
+
+    normalized = (values - values.min()) / value_range
+    return 1 - normalized if invert else normalized
+
+def rolling_mean(ordinals: np.ndarray, sums: np.ndarray, counts: np.ndarray, window: int) -> np.ndarray:
+    """
+        Attempt-weighted mean over the trailing window of periods (days, weeks or months) ending at each period, using prefix sums.
+        ordinals must be sorted ascending; missing periods count towards the window but contribute no attempts.
+    """
+    sum_prefix = np.concatenate(([0.0], np.cumsum(sums)))
+    count_prefix = np.concatenate(([0.0], np.cumsum(counts)))
+    window_starts = np.searchsorted(ordinals, ordinals - window + 1, side="left")
+    window_ends = np.arange(1, len(ordinals) + 1)
+    return safe_divide(sum_prefix[window_ends] - sum_prefix[window_starts], count_prefix[window_ends] - count_prefix[window_starts])
+
+def grouped_slopes(group_ids: np.ndarray, x: np.ndarray, y: np.ndarray, group_count: int) -> np.ndarray:
+    """
+        Least-squares slope of y over x for every group at once, from per-group sums. Groups with fewer than two distinct x are NaN.
+    """
+    n = np.bincount(group_ids, minlength=group_count).astype(np.float64)
+    sum_x = np.bincount(group_ids, weights=x, minlength=group_count)
+    sum_y = np.bincount(group_ids, weights=y, minlength=group_count)
+    sum_xy = np.bincount(group_ids, weights=x * y, minlength=group_count)
+    sum_xx = np.bincount(group_ids, weights=x * x, minlength=group_count)
+
+    denominator = n * sum_xx - sum_x ** 2
+    slopes = np.full(group_count, np.nan)
+    valid = denominator > 1e-12
+    slopes[valid] = (n[valid] * sum_xy[valid] - sum_x[valid] * sum_y[valid]) / denominator[valid]
+    return slopes
+
+def analyze_exercise_data(columns: ExerciseColumns, granularity: str = "day", rolling_window: Optional[int] = None) -> Dict[str, Any]:
+    """
+        Computes per-period (day, week or month) means, normalized scores and rolling averages over rolling_window periods,
+        plus per-exercise means and trend slopes (change per day).
+    """
+    period_days, _ = bucket_days(columns.days, granularity)
+    rolling_window = rolling_window or DEFAULT_ROLLING_WINDOWS[granularity]
+
+    if len(columns) == 0:
+        return {}
+
+    # Per-period aggregates across all exercises.
+    dates, day_index = np.unique(period_days, return_inverse=True)
+    day_count = len(dates)
+    daily_accuracy_counts = np.bincount(day_index, weights=columns.accuracy_counts, minlength=day_count)
+    daily_accuracy_sums = np.bincount(day_index, weights=columns.accuracy_sums, minlength=day_count)
+    daily_reaction_time_counts = np.bincount(day_index, weights=columns.reaction_time_counts, minlength=day_count)
+    daily_reaction_time_sums = np.bincount(day_index, weights=columns.reaction_time_sums, minlength=day_count)
+
+    avg_accuracy = safe_divide(daily_accuracy_sums, daily_accuracy_counts)
+    avg_reaction_time = safe_divide(daily_reaction_time_sums, daily_reaction_time_counts)
+    day_numbers = dates.astype(np.int64)
+    _, period_ordinals = bucket_days(dates, granularity)
+
+    # Per-exercise, per-day means, used for per-exercise trends.
+    exercise_count = len(columns.exercise_names)
+    pair_keys, pair_index = np.unique(columns.exercise_ids * day_count + day_index, return_inverse=True)
+    pair_exercise_ids = pair_keys // day_count
+    pair_day_numbers = day_numbers[pair_keys % day_count].astype(np.float64)
+    pair_accuracy = safe_divide(
+        np.bincount(pair_index, weights=columns.accuracy_sums),
+        np.bincount(pair_index, weights=columns.accuracy_counts)
+    )
+    pair_reaction_time = safe_divide(
+        np.bincount(pair_index, weights=columns.reaction_time_sums),
+        np.bincount(pair_index, weights=columns.reaction_time_counts)
+    )
+
+    exercise_accuracy_counts = np.bincount(columns.exercise_ids, weights=columns.accuracy_counts, minlength=exercise_count)
+    exercise_reaction_time_counts = np.bincount(columns.exercise_ids, weights=columns.reaction_time_counts, minlength=exercise_count)
+    overall_ids = np.zeros(day_count, dtype=np.int64)
+
+    return {
+        "daily": {
+            "dates": dates,
+            "attempts": daily_accuracy_counts,
+            "avg_accuracy": avg_accuracy,
+            "avg_reaction_time": avg_reaction_time,
+            "norm_accuracy": min_max_normalize(avg_accuracy, invert=False),
+            "norm_reaction_time": min_max_normalize(avg_reaction_time, invert=True),
+            "rolling_accuracy": rolling_mean(period_ordinals, daily_accuracy_sums, daily_accuracy_counts, rolling_window),
+            "rolling_reaction_time": rolling_mean(period_ordinals, daily_reaction_time_sums, daily_reaction_time_counts, rolling_window)
+        },
+        "per_exercise": {
+            "names": columns.exercise_names,
+            "attempts": exercise_accuracy_counts,
+            "avg_accuracy": safe_divide(np.bincount(columns.exercise_ids, weights=columns.accuracy_sums, minlength=exercise_count), exercise_accuracy_counts),
+            "avg_reaction_time": safe_divide(np.bincount(columns.exercise_ids, weights=columns.reaction_time_sums, minlength=exercise_count), exercise_reaction_time_counts),
+            "accuracy_slope": grouped_slopes(pair_exercise_ids, pair_day_numbers, pair_accuracy, exercise_count),
+            "reaction_time_slope": grouped_slopes(pair_exercise_ids, pair_day_numbers, pair_reaction_time, exercise_count)
+        },
+        "trend": {
+            "accuracy_slope": grouped_slopes(overall_ids, day_numbers.astype(np.float64), avg_accuracy, 1)[0],
+            "reaction_time_slope": grouped_slopes(overall_ids, day_numbers.astype(np.float64), avg_reaction_time, 1)[0]
+        }
+    }
+
+def analyze_exercise_attempts(attempts: List[Dict[str, Any]], granularity: str = "day", rolling_window: Optional[int] = None) -> Dict[str, Any]:
+    return analyze_exercise_data(ExerciseColumns.from_attempts(attempts), granularity, rolling_window)
+
+def analyze_exercise_rollups(rollups: List[Dict[str, Any]], granularity: str = "day", rolling_window: Optional[int] = None) -> Dict[str, Any]:
+    return analyze_exercise_data(ExerciseColumns.from_rollups(rollups), granularity, rolling_window)
+
+def optional_float(value: float) -> Optional[float]:
+    """
+        Converts a NumPy scalar to a JSON-safe float, mapping NaN to None.
+    """
+    value = float(value)
+    return None if np.isnan(value) else value
@@ -1,6 +1,11 @@
-from datetime import datetime
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import base64
+import json
 import logging
 
+from utils.analytics import optional_float
+
 
 """
     Utility functions for formatting and converting data types.
@@ -33,7 +38,7 @@ def iso_to_datetime(timestamp_str: str) -> datetime:
             timestamp = datetime.fromisoformat(timestamp_str)
 
         if timestamp.tzinfo is None:
-            timestamp = timestamp.replace(tzinfo=datetime.timezone.utc)
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
         
         return timestamp
     except ValueError:
@@ -41,16 +46,115 @@ def iso_to_datetime(timestamp_str: str) -> datetime:
     except Exception as e:
         raise RuntimeError(f"Error converting timestamp: {e}")
 
-def format_data_for_json(attempts: list[dict]) -> list[dict]:
+def parse_timezone(tz_name: str | None) -> tzinfo:
+    """
+        Convert an IANA timezone name (e.g. "America/New_York") to a tzinfo, UTC if not given.
+    """
+    if not tz_name:
+        return timezone.utc
+    try:
+        return ZoneInfo(tz_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Invalid timezone: {tz_name}")
+
+def local_day_bounds(day: date, tz: tzinfo) -> tuple[datetime, datetime]:
+    """
+        Return the [start, end) datetimes of a calendar day in the given timezone (end is the next local midnight, so DST days are 23 or 25 hours).
+    """
+    start = datetime.combine(day, time.min, tzinfo=tz)
+    end = datetime.combine(day + timedelta(days=1), time.min, tzinfo=tz)
+    return start, end
+
+def parse_day_or_timestamp(value: str, tz: tzinfo, end_of_range: bool = False) -> datetime:
     """
-        Format data for JSON output.
+        Convert a range bound to a datetime. A plain date (YYYY-MM-DD) is a local calendar day in tz, and as the end of a range it includes that whole day.
+        Anything else is parsed as an ISO 8601 timestamp.
     """
+    try:
+        day = date.fromisoformat(value)
+    except ValueError:
+        return iso_to_datetime(value)
+
+    start, end = local_day_bounds(day, tz)
+    return end if end_of_range else start
+
+def format_data_for_json(analysis: dict) -> list[dict]:
+    """
+        Format the per-day output of utils.analytics.analyze_exercise_data for JSON output, oldest day first.
+    """
+    if not analysis:
+        return []
+
+    daily = analysis["daily"]
     formatted_attempts = [
     {
       "date": date.isoformat(),
-      "avg_accuracy": vals[0],
-      "avg_reaction_time": vals[1]
+      "attempts": int(attempts),
+      "avg_accuracy": avg_accuracy,
+      "avg_reaction_time": avg_reaction_time,
+      "norm_accuracy": norm_accuracy,
+      "norm_reaction_time": norm_reaction_time,
+      "rolling_accuracy": rolling_accuracy,
+      "rolling_reaction_time": rolling_reaction_time
     }
-    for date, vals in sorted(attempts.items())
+    for date, attempts, avg_accuracy, avg_reaction_time, norm_accuracy, norm_reaction_time, rolling_accuracy, rolling_reaction_time in zip(
+        daily["dates"].astype(object),
+        daily["attempts"].tolist(),
+        daily["avg_accuracy"].tolist(),
+        daily["avg_reaction_time"].tolist(),
+        daily["norm_accuracy"].tolist(),
+        daily["norm_reaction_time"].tolist(),
+        daily["rolling_accuracy"].tolist(),
+        daily["rolling_reaction_time"].tolist()
+    )
 ]
-    return formatted_attempts
\ No newline at end of file
+    return formatted_attempts
+
+def format_exercise_summary_for_json(analysis: dict) -> dict:
+    """
+        Format the per-exercise means and trend slopes of utils.analytics.analyze_exercise_data for JSON output.
+    """
+    if not analysis:
+        return {"exercises": [], "trend": {"accuracy_slope": None, "reaction_time_slope": None}}
+
+    per_exercise = analysis["per_exercise"]
+    exercises = [
+        {
+            "exercise": name,
+            "attempts": int(per_exercise["attempts"][i]),
+            "avg_accuracy": optional_float(per_exercise["avg_accuracy"][i]),
+            "avg_reaction_time": optional_float(per_exercise["avg_reaction_time"][i]),
+            "accuracy_slope": optional_float(per_exercise["accuracy_slope"][i]),
+            "reaction_time_slope": optional_float(per_exercise["reaction_time_slope"][i])
+        }
+        for i, name in enumerate(per_exercise["names"])
+    ]
+
+    return {
+        "exercises": exercises,
+        "trend": {
+            "accuracy_slope": optional_float(analysis["trend"]["accuracy_slope"]),
+            "reaction_time_slope": optional_float(analysis["trend"]["reaction_time_slope"])
+        }
+    }
+
+def encode_page_token(cursor: dict) -> str:
+    """
+        Encode a pagination cursor (JSON-serializable dict) as an opaque, URL-safe page token.
+    """
+    cursor_json = json.dumps(cursor, separators=(",", ":"), sort_keys=True)
+    return base64.urlsafe_b64encode(cursor_json.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_page_token(page_token: str) -> dict:
+    """
+        Decode a page token created by encode_page_token back into its cursor dict.
+    """
+    try:
+        padded_token = page_token + "=" * (-len(page_token) % 4)
+        cursor = json.loads(base64.urlsafe_b64decode(padded_token.encode("ascii")))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid page token: {e}")
+
+    if not isinstance(cursor, dict):
+        raise ValueError("Invalid page token.")
+    return cursor
@@ -1,6 +1,9 @@
 import json
+import math
 import re
 
+from utils.formatters import iso_to_datetime
+
 """
     Utility functions for validating inputs.
 """
@@ -22,6 +25,42 @@ def check_valid_email(email: str) -> bool:
     """
     return re.match(r"[^@]+@[^@]+\.[^@]+", email) is not None
 
+def parse_exercise_attempt(attempt: dict) -> dict:
+    """
+        Validate a single exercise attempt from the frontend and convert its fields.
+        Returns a dict with exercise_name, timestamp (datetime), accuracy and avg_reaction_time (floats), raises ValueError if invalid.
+    """
+    if not isinstance(attempt, dict):
+        raise ValueError("Attempt must be an object.")
+
+    exercise_name = attempt.get("exercise")
+    timestamp = attempt.get("timestamp")
+    if not exercise_name or not isinstance(exercise_name, str) or "/" in exercise_name:
+        raise ValueError("A valid exercise name is required.")
+    if not timestamp or not isinstance(timestamp, str):
+        raise ValueError("Timestamp is required.")
+
+    try:
+        accuracy = float(attempt.get("accuracy"))
+        avg_reaction_time = float(attempt.get("avg_reaction_time"))
+    except (TypeError, ValueError):
+        raise ValueError("Accuracy and average reaction time must be numbers.")
+
+    if not math.isfinite(accuracy) or not math.isfinite(avg_reaction_time):
+        raise ValueError("Accuracy and average reaction time must be finite numbers.")
+
+    try:
+        formatted_timestamp = iso_to_datetime(timestamp)
+    except (ValueError, RuntimeError) as e:
+        raise ValueError(str(e))
+
+    return {
+        "exercise_name": exercise_name,
+        "timestamp": formatted_timestamp,
+        "accuracy": accuracy,
+        "avg_reaction_time": avg_reaction_time
+    }
+
 """
     Utility functions for validating outputs (e.g., generated AI content).
 """
@@ -0,0 +1,117 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+
+"""
+    Utility classes for running work off the request thread.
+"""
+class RetryingWorkerPool:
+    """
+        Bounded thread pool that runs submitted jobs with retries and exponential backoff (with jitter).
+        max_workers caps how many jobs run at once; jobs beyond that wait in the executor's queue.
+    """
+    def __init__(self, name: str, max_workers: int = 4, max_retries: int = 3, base_delay: float = 1.0, max_delay: float = 30.0, retry_on: tuple = (Exception,)):
+        self.name = name
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_on = retry_on
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.retried = 0
+
+    def submit(self, fn: Callable[..., Any], *args, on_failure: Optional[Callable[[Exception], None]] = None, **kwargs) -> Future:
+        """
+            Queues fn(*args, **kwargs). on_failure is called with the last error once all retries are used up.
+        """
+        with self._lock:
+            self.submitted += 1
+        return self._executor.submit(self._run, fn, args, kwargs, on_failure)
+
+    def backoff_delay(self, attempt: int) -> float:
+        """
+            Delay before retry number attempt (1-based): base_delay * 2^(attempt-1), capped at max_delay, with full jitter.
+        """
+        delay = min(self.base_delay * (2 ** (attempt - 1)), self.max_delay)
+        return random.uniform(0, delay)
+
+    def _run(self, fn: Callable[..., Any], args: tuple, kwargs: dict, on_failure: Optional[Callable[[Exception], None]]) -> Any:
+        attempt = 0
+        while True:
+            try:
+                result = fn(*args, **kwargs)
+                with self._lock:
+                    self.succeeded += 1
+                return result
+            except self.retry_on as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    logging.error(f"{self.name}: job failed after {self.max_retries} retries: {e}")
+                    with self._lock:
+                        self.failed += 1
+                    if on_failure is not None:
+                        try:
+                            on_failure(e)
+                        except Exception as callback_error:
+                            logging.error(f"{self.name}: failure callback raised: {callback_error}")
+                    raise
+
+                with self._lock:
+                    self.retried += 1
+                logging.warning(f"{self.name}: attempt {attempt} failed, retrying: {e}")
+                time.sleep(self.backoff_delay(attempt))
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "retried": self.retried
+            }
+
+
+class PeriodicTask:
+    """
+        Runs fn every interval seconds on a daemon thread until stopped. Errors are logged and the task keeps running.
+    """
+    def __init__(self, name: str, fn: Callable[[], Any], interval: float):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.fn()
+            except Exception as e:
+                logging.error(f"{self.name}: periodic task failed: {e}")